@@ -5,22 +5,41 @@ import os
 
 from huntsman.drp.collection import ExposureCollection, CalibCollection
 
+
+def list_existing_files(directory):
+    """ Return the set of file basenames in a directory, or an empty set if it does not exist.
+    Using scandir lists the directory once rather than calling stat on every file.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return set([e.name for e in entries if e.is_file()])
+    except FileNotFoundError:
+        return set()
+
+
 if __name__ == "__main__":
 
     collections = (ExposureCollection(), CalibCollection())
 
     for collection in collections:
 
-        docs_to_delete = set()
-        for doc in collection.find():
+        # Only the filenames are needed, so avoid retrieving the full documents
+        filenames = collection.find(key="filename")
+
+        # List each directory once
+        dirnames = set([os.path.dirname(filename) for filename in filenames])
+        existing_by_dir = {d: list_existing_files(d) for d in dirnames}
+
+        docs_to_delete = []
+        for filename in filenames:
 
             # Check if the file actually exists
-            filename = doc["filename"]
-            if not os.path.isfile(filename):
+            dirname, basename = os.path.split(filename)
+            if basename not in existing_by_dir[dirname]:
                 collection.logger.warning(f"File {filename} does not exist in {collection}."
                                           " Removing document.")
-                docs_to_delete.add(doc)
+                docs_to_delete.append({"filename": filename})
 
         # Delete documents from collection
         collection.logger.info(f"Deleting {len(docs_to_delete)} documents.")
-        collection.delete_many(docs_to_delete)
+        collection.delete_many(docs_to_delete, force=True)
@@ -1,5 +1,10 @@
 import os
-from huntsman.drp.services.plotter import PlotterService
+
+# The plotter runs headless, so use the non-interactive backend before pyplot is imported
+import matplotlib
+matplotlib.use("Agg")
+
+from huntsman.drp.services.plotter import PlotterService  # noqa: E402
 
 if __name__ == "__main__":
 
@@ -27,7 +27,8 @@ class HuntsmanBase():
         config = get_config() if config is None else config
         logger = get_logger() if logger is None else logger
 
-        instance_kwargs = config.get(config_name, {})
+        # Copy so that the overrides do not modify the config
+        instance_kwargs = dict(config.get(config_name, {}))
         instance_kwargs.update(**kwargs)
 
         logger.debug(f"Creating {cls.__name__} instance with kwargs: {instance_kwargs}")
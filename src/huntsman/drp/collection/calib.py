@@ -1,7 +1,9 @@
 import os
 import shutil
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
+from pymongo import ReplaceOne
 
 from huntsman.drp.utils.date import parse_date, date_to_ymd
 from huntsman.drp.utils.fits import read_fits_header, parse_fits_header
@@ -17,6 +19,9 @@ class BaseCalibCollection(Collection):
     _DocumentClass = CalibDocument
     _dataset_type_key = "datasetType"
 
+    # Speed up queries by calib type, which is used by every calib match
+    _extra_indexes = ((_dataset_type_key, "filename"),)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -109,11 +114,13 @@ class CalibCollection(BaseCalibCollection):
         # Set the calib archive directory
         self.archive_dir = self.config["directories"]["calib"]
 
-    def get_calib_filename(self, metadata, extension=".fits"):
+    def get_calib_filename(self, metadata, extension=".fits", date_ymd=None):
         """ Get the archived calib filename from metadata.
         Args:
             metadata (dict): The calib metadata.
             extension (str, optional): The file extension. Default: '.fits'.
+            date_ymd (str, optional): The calib date in YYYY-MM-DD format. If not provided, will
+                be determined from the date in the metadata.
         Returns:
             str: The archived filename.
         """
@@ -121,7 +128,8 @@ class CalibCollection(BaseCalibCollection):
 
         # LSST calib filenames do not include calib date, so add as parent directory
         # Also store in subdirs of datasetType
-        date_ymd = date_to_ymd(metadata["date"])
+        if date_ymd is None:
+            date_ymd = date_to_ymd(metadata["date"])
         subdir = os.path.join(date_ymd, datasetType)
 
         # Get ordered fields used to create archived filename
@@ -134,6 +142,29 @@ class CalibCollection(BaseCalibCollection):
 
         return os.path.join(self.archive_dir, subdir, basename)
 
+    def list_archived_filenames(self, date_ymd):
+        """ Get the filenames of all calibs in the archive for a given calib date.
+        Args:
+            date_ymd (str): The calib date in YYYY-MM-DD format.
+        Returns:
+            set of str: The archived filenames.
+        """
+        filenames = set()
+
+        date_dir = os.path.join(self.archive_dir, date_ymd)
+        if not os.path.isdir(date_dir):
+            return filenames
+
+        # Use scandir to avoid a separate stat call for each calib file
+        with os.scandir(date_dir) as type_dirs:
+            for type_dir in type_dirs:
+                if not type_dir.is_dir():
+                    continue
+                with os.scandir(type_dir.path) as entries:
+                    filenames.update([e.path for e in entries if e.is_file()])
+
+        return filenames
+
     def archive_master_calib(self, filename, metadata):
         """ Copy the FITS files into the archive directory and update the entry in the DB.
 
@@ -142,8 +173,53 @@ class CalibCollection(BaseCalibCollection):
                 dir.
             metadata (abc.Mapping): The calib metadata to be stored in the document.
         """
+        metadata = self._copy_to_archive(filename, metadata)
+
+        # Insert the metadata into the calib database
+        # Use replace operation with upsert because old document may already exist
+        self.replace_one({"filename": metadata["filename"]}, metadata, upsert=True)
+
+    def archive_master_calibs(self, filenames_and_metadata, nproc=4):
+        """ Archive several master calibs at once.
+        The files are copied concurrently and the DB is updated with a single bulk write.
+        Args:
+            filenames_and_metadata (iterable of tuple): (filename, metadata) pairs, as parsed to
+                archive_master_calib. Tuples may also contain the archive filename as a third
+                item if it is already known.
+            nproc (int, optional): The number of threads used to copy the files. Default: 4.
+        """
+        filenames_and_metadata = list(filenames_and_metadata)
+        if not filenames_and_metadata:
+            return
+
+        # Copying is I/O bound so use threads
+        with ThreadPool(min(nproc, len(filenames_and_metadata))) as pool:
+            metadata_list = pool.starmap(self._copy_to_archive, filenames_and_metadata)
+
+        # Use replace operations with upsert because old documents may already exist
+        requests = []
+        for metadata in metadata_list:
+            mongo_doc = self._prepare_doc_for_insert(metadata).to_mongo()  # Implicit validation
+            requests.append(ReplaceOne({"filename": metadata["filename"]}, mongo_doc, upsert=True))
+
+        self.logger.debug(f"Archiving {len(requests)} calibs in {self}.")
+        self._collection.bulk_write(requests, ordered=False)
+
+    # Private methods
+
+    def _copy_to_archive(self, filename, metadata, archive_filename=None):
+        """ Copy a calib file into the archive directory.
+        Args:
+            filename (str): The filename of the calib to copy.
+            metadata (abc.Mapping): The calib metadata.
+            archive_filename (str, optional): The archive filename. If not provided or if its
+                extension does not match the calib file, it is determined from the metadata.
+        Returns:
+            dict: A copy of the metadata with the archived filename.
+        """
         extension = os.path.splitext(filename)[-1]
-        archive_filename = self.get_calib_filename(metadata, extension=extension)
+        if archive_filename is None or not archive_filename.endswith(extension):
+            archive_filename = self.get_calib_filename(metadata, extension=extension)
 
         # Copy the file into the calib archive, overwriting if necessary
         self.logger.debug(f"Copying {filename} to {archive_filename}.")
@@ -151,12 +227,10 @@ class CalibCollection(BaseCalibCollection):
         shutil.copy(filename, archive_filename)
 
         # Update the document before archiving
-        metadata = metadata.copy()
+        metadata = dict(metadata)
         metadata["filename"] = archive_filename
 
-        # Insert the metadata into the calib database
-        # Use replace operation with upsert because old document may already exist
-        self.replace_one({"filename": archive_filename}, metadata, upsert=True)
+        return metadata
 
 
 class ReferenceCalibCollection(BaseCalibCollection):
@@ -16,6 +16,8 @@ class Collection(HuntsmanBase):
     and inserting/updating/deleting documents, as well as validating new documents.
     """
     _index_fields = None
+    _extra_indexes = ()  # Tuples of fields used to create additional non-unique indexes
+    _delete_batch_size = 1000  # Maximum number of documents matched by a single forced delete
     _required_fields = None
     _DocumentClass = None
 
@@ -50,7 +52,7 @@ class Collection(HuntsmanBase):
 
     # Public methods
     def find(self, document_filter=None, key=None, quality_filter=False, limit=None, sort_by=None,
-             sort_direction=pymongo.ASCENDING, **kwargs):
+             sort_direction=pymongo.ASCENDING, projection=None, **kwargs):
         """Get data for one or more matches in the table.
         Args:
             document_filter (dict, optional): A dictionary containing key, value pairs to be
@@ -64,31 +66,27 @@ class Collection(HuntsmanBase):
             sort_by (str, optional): If provided, sort results by this key. Default: None.
             sort_direction (int, optional): The sorting direction. Use pymongo.ASCENDING or
                 pymongo.DESCENDING. Default: pymongo.ASCENDING.
+            projection (iterable of str, optional): If provided, only these fields are returned
+                by the database. Default: None.
             **kwargs: Parsed to make_mongo_date_constraint.
         Returns:
             result (list): List of DataIds or key values if key is specified.
         """
-        document_filter = Document(document_filter, copy=True)
-        with suppress(KeyError):
-            del document_filter["date_modified"]  # This might change so don't match with it
-
-        # Add date range to criteria if provided
-        date_constraint = make_mongo_date_constraint(**kwargs)
-        if date_constraint:
-            document_filter.update({self._date_key: date_constraint})
-
-        mongo_filter = document_filter.to_mongo(flatten=True)
-
-        # Add quality cuts to document filter
-        if quality_filter:
-            mongo_quality_filter = self._get_quality_filter()
-            if mongo_quality_filter:
-                mongo_filter = mongo_logical_and([mongo_filter, mongo_quality_filter])
+        mongo_filter = self._get_mongo_filter(document_filter, quality_filter=quality_filter,
+                                              **kwargs)
 
         self.logger.debug(f"Performing mongo find operation with filter: {mongo_filter}.")
 
+        # Only retrieve the requested fields
+        # If a key is specified, only that field is needed
+        if key is not None and projection is None:
+            projection = (key,)
+        mongo_projection = {"_id": False}
+        if projection is not None:
+            mongo_projection.update({k: True for k in projection})
+
         # Do the mongo query
-        cursor = self._collection.find(mongo_filter, {"_id": False})
+        cursor = self._collection.find(mongo_filter, mongo_projection)
 
         # Sort results
         if sort_by is not None:
@@ -151,9 +149,11 @@ class Collection(HuntsmanBase):
         document_filter = Document(document_filter)
 
         # Make sure the filter matches with at most one doc
-        if self.count_documents(document_filter) > 1:
-            raise RuntimeError(f"Document filter {document_filter} matches with multiple documents"
-                               f" in {self}.")
+        # This is guaranteed by the unique index if the filter matches on all index fields
+        if not self._filter_is_unique(document_filter):
+            if self.count_documents(document_filter, limit=2) > 1:
+                raise RuntimeError(f"Document filter {document_filter} matches with multiple"
+                                   f" documents in {self}.")
 
         mongo_filter = document_filter.to_mongo()
         mongo_doc = self._prepare_doc_for_insert(replacement).to_mongo()  # Implicit validation
@@ -176,26 +176,71 @@ class Collection(HuntsmanBase):
         with suppress(KeyError):
             del document_filter["date_modified"]  # This might change so don't match with it
 
-        count = self.count_documents(document_filter)
-        if count > 1:
-            raise RuntimeError(f"Multiple matches found for document in {self}: {document_filter}.")
+        # Make sure the filter matches with at most one doc
+        # This is guaranteed by the unique index if the filter matches on all index fields
+        if not self._filter_is_unique(document_filter):
+            if self.count_documents(document_filter, limit=2) > 1:
+                raise RuntimeError(f"Multiple matches found for document in {self}:"
+                                   f" {document_filter}.")
+
+        new_document = Document(to_update, copy=True)
+        new_document["date_modified"] = current_date()
+
+        # Use flattened version (dot notation) for nested updates to work properly
+        mongo_update = new_document.to_mongo(flatten=True)
 
-        elif count == 0:
+        # Check for a match using the result of the update rather than querying beforehand
+        self.logger.debug(f"Updating document with: {mongo_update}")
+        result = self._collection.update_one(self._get_mongo_filter(document_filter),
+                                             {'$set': mongo_update}, upsert=False)
+        if result.matched_count == 0:
             if upsert:
                 self.insert_one(to_update)
-                return
             else:
                 raise RuntimeError(f"No matches found for document {document_filter} in {self}. Use"
                                    " upsert=True to upsert.")
 
-        to_update = Document(to_update)
-        to_update["date_modified"] = current_date()
+    def bulk_update(self, updates):
+        """ Update many documents in the table with a single database request.
+        Args:
+            updates (iterable of tuple): Tuples of (document_filter, to_update), where
+                document_filter identifies a single document and to_update contains the key,
+                value pairs to update within it. See update_one.
+        Raises:
+            RuntimeError: If a document filter matches with more than one document, or if not
+                every filter matches with a document.
+        """
+        requests = []
+        date_modified = current_date()
 
-        # Use flattened version (dot notation) for nested updates to work properly
-        mongo_update = to_update.to_mongo(flatten=True)
+        for document_filter, to_update in updates:
 
-        self.logger.debug(f"Updating document with: {mongo_update}")
-        self._collection.update_one(document_filter, {'$set': mongo_update}, upsert=False)
+            document_filter = Document(document_filter, copy=True)
+            with suppress(KeyError):
+                del document_filter["date_modified"]  # This might change so don't match with it
+
+            # Make sure the filter matches with at most one doc
+            if not self._filter_is_unique(document_filter):
+                if self.count_documents(document_filter, limit=2) > 1:
+                    raise RuntimeError(f"Multiple matches found for document in {self}:"
+                                       f" {document_filter}.")
+
+            new_document = Document(to_update, copy=True)
+            new_document["date_modified"] = date_modified
+
+            # Use flattened version (dot notation) for nested updates to work properly
+            mongo_update = new_document.to_mongo(flatten=True)
+            requests.append(pymongo.UpdateOne(self._get_mongo_filter(document_filter),
+                                              {'$set': mongo_update}))
+        if not requests:
+            return
+
+        self.logger.debug(f"Updating {len(requests)} documents in {self}.")
+        result = self._collection.bulk_write(requests, ordered=False)
+
+        if result.matched_count != len(requests):
+            raise RuntimeError(f"Only {result.matched_count} of {len(requests)} documents were"
+                               f" matched in {self}.")
 
     def delete_one(self, document_filter, force=False):
         """Delete one document from the table.
@@ -209,7 +254,7 @@ class Collection(HuntsmanBase):
         mongo_filter = document_filter.to_mongo()
 
         if not force:
-            count = self.count_documents(document_filter)
+            count = self.count_documents(document_filter, limit=2)
             if count > 1:
                 raise RuntimeError(f"Multiple matches found for document in {self}:"
                                    f" {document_filter}.")
@@ -229,16 +274,39 @@ class Collection(HuntsmanBase):
         for d in documents:
             self.insert_one(d, **kwargs)
 
-    def delete_many(self, documents, **kwargs):
+    def delete_many(self, documents, force=False, **kwargs):
         """ Delete one document from the table.
         Args:
             documents (list): List of dictionaries that specify documents to be deleted from the
                 table.
+            force (bool, optional): If True, ignore checks and delete all matching documents in
+                batched operations. Default False.
+            **kwargs: Parsed to self.delete_one. Not allowed if force is True.
+        Raises:
+            TypeError: If kwargs are provided with force=True.
         """
         self.logger.debug(f"Deleting {len(documents)} documents from {self}.")
 
+        if not force:
+            for d in documents:
+                self.delete_one(d, **kwargs)
+            return
+
+        if kwargs:
+            raise TypeError(f"Unexpected arguments for forced delete: {list(kwargs.keys())}.")
+
+        # Match on the unique index fields where possible to keep the filters small
+        mongo_filters = []
         for d in documents:
-            self.delete_one(d, **kwargs)
+            doc = Document(d, validate=False)
+            if self._filter_is_unique(doc):
+                doc = Document({k: doc[k] for k in self._index_fields}, validate=False)
+            mongo_filters.append(doc.to_mongo())
+
+        # Delete in batches so each query stays well below the maximum BSON document size
+        batch_size = self._delete_batch_size
+        for i in range(0, len(mongo_filters), batch_size):
+            self._collection.delete_many({"$or": mongo_filters[i:i + batch_size]})
 
     def find_latest(self, days=0, hours=0, seconds=0, **kwargs):
         """ Convenience function to query the latest files in the db.
@@ -253,21 +321,58 @@ class Collection(HuntsmanBase):
         date_min = date_now - timedelta(days=days, hours=hours, seconds=seconds)
         return self.find(date_min=date_min, **kwargs)
 
-    def delete_all(self, really=False, **kwargs):
-        """ Delete all documents from the collection. """
+    def delete_all(self, really=False, drop=False):
+        """ Delete all documents from the collection.
+        Args:
+            really (bool, optional): Must be True to delete the documents. Default: False.
+            drop (bool, optional): If True, drop the collection and recreate its indexes rather
+                than deleting documents one by one. This is much faster for large collections.
+                Default: False.
+        """
         if not really:
             raise RuntimeError("If you really want to do this, parse really=True.")
-        docs = self.find()
-        self.delete_many(docs, **kwargs)
+        self.logger.debug(f"Deleting all documents from {self}.")
+
+        if drop:
+            self._collection.drop()
+            self._create_indexes()
+        else:
+            self._collection.delete_many({})
 
-    def count_documents(self, *args, **kwargs):
+    def count_documents(self, document_filter=None, limit=None, **kwargs):
         """ Count the number of matching documents in the collection.
+        The documents are counted by the database rather than being retrieved.
         Args:
-            *args, **kwargs: Parsed to self.find.
+            document_filter (dict, optional): A dictionary containing key, value pairs to be
+                matched against other documents, by default None
+            limit (int, optional): If provided, stop counting after this many matches.
+            **kwargs: Parsed to self._get_mongo_filter.
         Returns:
             int: The number of matching documents in the collection.
         """
-        return len(self.find(*args, **kwargs))
+        mongo_filter = self._get_mongo_filter(document_filter, **kwargs)
+
+        count_kwargs = {} if limit is None else {"limit": limit}
+
+        return self._collection.count_documents(mongo_filter, **count_kwargs)
+
+    def count_by(self, key, document_filter=None, **kwargs):
+        """ Count the number of matching documents for each value of a key.
+        The documents are grouped and counted by the database rather than being retrieved.
+        Args:
+            key (str): The key to group the documents by, e.g. datasetType.
+            document_filter (dict, optional): A dictionary containing key, value pairs to be
+                matched against other documents, by default None
+            **kwargs: Parsed to self._get_mongo_filter.
+        Returns:
+            dict: Dict of key value: number of matching documents.
+        """
+        mongo_filter = self._get_mongo_filter(document_filter, **kwargs)
+
+        pipeline = [{"$match": mongo_filter},
+                    {"$group": {"_id": f"${key}", "count": {"$sum": 1}}}]
+
+        return {d["_id"]: d["count"] for d in self._collection.aggregate(pipeline)}
 
     # Private methods
 
@@ -298,12 +403,62 @@ class Collection(HuntsmanBase):
         self._db = self._client[self._db_name]
         self._collection = self._db[self.collection_name]
 
+        self._create_indexes()
+
+    def _create_indexes(self):
+        """ Create the collection indexes if they do not already exist. """
         # Create unique index
         # This leverages mongdb's server-side locking mechanism for thread-safety on inserts
         if self._index_fields is not None:
             self._collection.create_index([(k, pymongo.ASCENDING) for k in self._index_fields],
                                           unique=True)
 
+        # Create additional indexes to speed up common queries
+        for index_fields in self._extra_indexes:
+            self._collection.create_index([(k, pymongo.ASCENDING) for k in index_fields])
+
+    def _filter_is_unique(self, document_filter):
+        """ Check if a document filter can match with at most one document.
+        Args:
+            document_filter (dict): The document filter.
+        Returns:
+            bool: True if the filter specifies an exact value for every unique index field.
+        """
+        if not self._index_fields:
+            return False
+        return all([k in document_filter and not isinstance(document_filter[k], dict)
+                    for k in self._index_fields])
+
+    def _get_mongo_filter(self, document_filter=None, quality_filter=False, **kwargs):
+        """ Convert a document filter into a mongo filter.
+        Args:
+            document_filter (dict, optional): A dictionary containing key, value pairs to be
+                matched against other documents, by default None
+            quality_filter (bool, optional): If True, add quality cuts to the filter.
+                Default: False.
+            **kwargs: Parsed to make_mongo_date_constraint.
+        Returns:
+            dict: The mongo filter.
+        """
+        document_filter = Document(document_filter, copy=True)
+        with suppress(KeyError):
+            del document_filter["date_modified"]  # This might change so don't match with it
+
+        # Add date range to criteria if provided
+        date_constraint = make_mongo_date_constraint(**kwargs)
+        if date_constraint:
+            document_filter.update({self._date_key: date_constraint})
+
+        mongo_filter = document_filter.to_mongo(flatten=True)
+
+        # Add quality cuts to document filter
+        if quality_filter:
+            mongo_quality_filter = self._get_quality_filter()
+            if mongo_quality_filter:
+                mongo_filter = mongo_logical_and([mongo_filter, mongo_quality_filter])
+
+        return mongo_filter
+
     def _prepare_doc_for_insert(self, document):
         """ Prepare a document to be inserted into the database.
         Args:
@@ -1,5 +1,10 @@
+import os
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
 
+from pymongo import ReplaceOne
 from pymongo.errors import DuplicateKeyError
 
 from huntsman.drp.utils import mongo
@@ -8,7 +13,7 @@ from huntsman.drp.utils.date import parse_date
 from huntsman.drp.utils.fits import read_fits_data, read_fits_header, parse_fits_header
 from huntsman.drp.collection.collection import Collection
 from huntsman.drp.collection.calib import ReferenceCalibCollection
-from huntsman.drp.document import ExposureDocument, CalibDocument
+from huntsman.drp.document import Document, ExposureDocument, CalibDocument
 from huntsman.drp.metrics.raw import metric_evaluator
 from huntsman.drp.document import CalibDocument, ExposureDocument
 
@@ -24,13 +29,19 @@ class ExposureCollection(Collection):
     # Flag to specify if the raw metrics were calculated successfully during ingestion
     _metric_success_flag = METRIC_SUCCESS_FLAG
 
+    # Cover the query used to find successfully ingested files
+    # Most other queries select an observation type within a date range
+    _extra_indexes = ((METRIC_SUCCESS_FLAG, "filename"),
+                      ("observation_type", "date"),
+                      ("date",))
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         # Ignore certain metrics if required
+        # Use a copy of the evaluator so that other instances are not affected
         metrics_ignore = self.config.get("raw_metrics_ignore", ())
-        for metric_name in metrics_ignore:
-            metric_evaluator.remove_function(metric_name)
+        self._metric_evaluator = metric_evaluator.copy(ignore=metrics_ignore)
 
         self.ref_calib_collection = ReferenceCalibCollection.from_config(self.config)
 
@@ -48,14 +59,15 @@ class ExposureCollection(Collection):
         doc = self._DocumentClass(document, copy=True, config=self.config)
         filename = doc["filename"]
 
-        if filename.endswith(".fits"):
-            if self.find({"filename": filename + ".fz"}):
-                raise DuplicateKeyError(f"Tried to insert {filename} but a .fz version exists.")
-
-        elif filename.endswith(".fits.fz"):
-            if self.find({"filename": filename.strip(".fz")}):
+        if filename.endswith(".fits.fz"):
+            # Remove the .fz suffix by slicing as str.strip would also remove leading characters
+            if self._filename_exists(filename[:-3]):
                 raise DuplicateKeyError(f"Tried to insert {filename} but a .fits version exists.")
 
+        elif filename.endswith(".fits"):
+            if self._filename_exists(filename + ".fz"):
+                raise DuplicateKeyError(f"Tried to insert {filename} but a .fz version exists.")
+
         return super().insert_one(document, *args, **kwargs)
 
     def ingest_file(self, filename, **kwargs):
@@ -65,22 +77,7 @@ class ExposureCollection(Collection):
         """
         self.logger.debug(f"Ingesting file into {self}: {filename}.")
 
-        document = {"filename": filename}
-        try:
-            document["metrics"], success = self._calculate_metrics(filename, **kwargs)
-            document[self._metric_success_flag] = success
-        except Exception as err:
-            self.logger.error(f"Error calculating metrics for {filename}: {err!r}")
-            document[self._metric_success_flag] = False
-
-        # Try and update the document with the parsed header
-        # NOTE: We read the header again because it may have been modified
-        try:
-            parsed_header = parse_fits_header(read_fits_header(filename))
-            document.update(parsed_header)
-        # Log error and insert document into DB anyway
-        except Exception as err:
-            self.logger.error(f"Error parsing header for {filename}: {err!r}")
+        document = self._make_document(filename, **kwargs)
 
         # Use filename query as metrics etc can change
         self.replace_one({"filename": filename}, document, upsert=True)
@@ -89,6 +86,43 @@ class ExposureCollection(Collection):
         if not document[self._metric_success_flag]:
             raise RuntimeError(f"Metric evaluation unsuccessful for {filename}.")
 
+    def ingest_files(self, filenames, nproc=1, **kwargs):
+        """ Calculate metrics and insert / update documents for many files in a single operation.
+        Args:
+            filenames (iterable of str): The filenames to ingest.
+            nproc (int, optional): The number of threads used to calculate metrics. Default: 1.
+            **kwargs: Parsed to self._make_document.
+        Raises:
+            RuntimeError: If metric evaluation was unsuccessful for any of the files. All of the
+                files are still ingested.
+        """
+        filenames = list(filenames)
+        if not filenames:
+            return
+        self.logger.debug(f"Ingesting {len(filenames)} files into {self}.")
+
+        make_document = partial(self._make_document, **kwargs)
+        if nproc > 1:
+            with ThreadPool(nproc) as pool:
+                documents = pool.map(make_document, filenames)
+        else:
+            documents = [make_document(f) for f in filenames]
+
+        # Use filename queries as metrics etc can change
+        requests = []
+        for document in documents:
+            mongo_filter = Document({"filename": document["filename"]}).to_mongo()
+            mongo_doc = self._prepare_doc_for_insert(document).to_mongo()  # Implicit validation
+            requests.append(ReplaceOne(mongo_filter, mongo_doc, upsert=True))
+
+        # Write all of the documents with a single request
+        self._collection.bulk_write(requests, ordered=False)
+
+        failed = [d["filename"] for d in documents if not d[self._metric_success_flag]]
+        if failed:
+            raise RuntimeError(f"Metric evaluation unsuccessful for {len(failed)} files:"
+                               f" {failed}.")
+
     def get_matching_raw_calibs(self, calib_document, sort_date=None, **kwargs):
         """ Return matching set of calib IDs for a given calib document.
         Args:
@@ -139,12 +173,25 @@ class ExposureCollection(Collection):
 
         data_types = self.config["calibs"]["types"]
 
-        # Get metadata for all raw calibs that are valid for this date
-        documents = self.find({"observation_type": {"$in": data_types}},
-                              quality_filter=quality_filter, **kwargs)
-
-        # Extract the calib docs from the set of exposure docs
-        calib_docs = set([self.raw_doc_to_calib_doc(d, date=date) for d in documents])
+        # Match all raw calibs that are valid for this date
+        mongo_filter = self._get_mongo_filter({"observation_type": {"$in": data_types}},
+                                              quality_filter=quality_filter, **kwargs)
+
+        # Group the raw calibs by their calib matching fields on the server
+        # This way only the unique calib IDs are returned rather than every raw document
+        facets = {}
+        for data_type in data_types:
+            keys = self.config["calibs"]["required_fields"][data_type]
+            facets[data_type] = [{"$match": {"observation_type": data_type}},
+                                 {"$group": {"_id": {k: f"${k}" for k in keys}}}]
+        result = next(self._collection.aggregate([{"$match": mongo_filter}, {"$facet": facets}]))
+
+        # Extract the calib docs from the grouped raw calib metadata
+        calib_docs = set()
+        for data_type, groups in result.items():
+            for group in groups:
+                document = dict(group["_id"], observation_type=data_type)
+                calib_docs.add(self.raw_doc_to_calib_doc(document, date=date))
         self.logger.debug(f"Found {len(calib_docs)} possible calib documents.")
 
         # Get defects docs by copying darks
@@ -189,6 +236,15 @@ class ExposureCollection(Collection):
 
     # Private methods
 
+    def _filename_exists(self, filename):
+        """ Check if a document with the given filename exists in the collection.
+        Args:
+            filename (str): The filename.
+        Returns:
+            bool: True if the document exists, else False.
+        """
+        return self._collection.count_documents({"filename": filename}, limit=1) > 0
+
     def _get_quality_filter(self):
         """ Return the Query object corresponding to quality cuts.
         Returns:
@@ -210,15 +266,52 @@ class ExposureCollection(Collection):
 
         return mongo.mongo_logical_or(filters)
 
+    def _make_document(self, filename, **kwargs):
+        """ Make the document for a file by calculating its metrics and parsing its header.
+        Args:
+            filename (str): The filename.
+            **kwargs: Parsed to self._calculate_metrics.
+        Returns:
+            dict: The document.
+        """
+        document = {"filename": filename}
+        parsed_header = None
+        try:
+            mtime = os.stat(filename).st_mtime_ns
+            document["metrics"], success, parsed_header = self._calculate_metrics(
+                filename, **kwargs)
+            document[self._metric_success_flag] = success
+
+            # Metrics (e.g. get_wcs) may have written to the file, in which case re-read below
+            if os.stat(filename).st_mtime_ns != mtime:
+                parsed_header = None
+
+        except Exception as err:
+            self.logger.error(f"Error calculating metrics for {filename}: {err!r}")
+            document[self._metric_success_flag] = False
+
+        # Try and update the document with the parsed header
+        # NOTE: We only read the header again if it may have been modified
+        try:
+            if parsed_header is None:
+                parsed_header = parse_fits_header(read_fits_header(filename))
+            document.update(parsed_header)
+        # Log error and insert document into DB anyway
+        except Exception as err:
+            self.logger.error(f"Error parsing header for {filename}: {err!r}")
+
+        return document
+
     def _calculate_metrics(self, filename, **kwargs):
         """ Calculate metrics for a file, typically on ingestion.
         This function will query the calib collection for reference images.
         Args:
             filename (str): The filename.
-            **kwargs: Parsed to metric_evaluator.evaluate.
+            **kwargs: Parsed to MetricEvaluator.evaluate.
         Returns:
             dict: The dictionary of metrics.
             bool: True if the metric calculation was successful, else False.
+            dict: The parsed FITS header read before calculating the metrics.
         """
         self.logger.debug(f"Calculating metrics for {filename}")
 
@@ -241,10 +334,10 @@ class ExposureCollection(Collection):
                     self.logger.warning(f"Unable to find reference calib for {filename}: {err!r}")
 
         # Calculate metrics
-        metrics, success = metric_evaluator.evaluate(
+        metrics, success = self._metric_evaluator.evaluate(
             filename, header=header, parsed_header=parsed_header, data=data, ref_image=ref_image,
             **kwargs)
 
         self.logger.debug(f"Finished calculating metrics for {filename}, success={success}")
 
-        return metrics, success
+        return metrics, success, parsed_header
@@ -1,5 +1,6 @@
 import os
 import random
+import shutil
 from tempfile import TemporaryDirectory
 
 import lsst.daf.butler as dafButler
@@ -113,6 +114,22 @@ class ButlerRepository(HuntsmanBase):
         butler = self.get_butler(collections=collections)
         return butler.get(datasetType, **kwargs)
 
+    def get_many(self, datasetTypes, collections=None, **kwargs):
+        """ Get several items from the Butler repository using the same butler object.
+        This avoids creating a new butler, and so reconnecting to the registry, for each item.
+        Args:
+            datasetTypes (iterable of str): The dataset types to get.
+            collections (iterable of str, optional): Search for items in these collections. If not
+                provided, will use default search collections.
+            **kwargs: Parsed to butler.get.
+        Returns:
+            dict: The retrieved objects keyed by dataset type.
+        """
+        if collections is None:
+            collections = self.search_collections
+        butler = self.get_butler(collections=collections)
+        return {datasetType: butler.get(datasetType, **kwargs) for datasetType in datasetTypes}
+
     def get_dimension_names(self, datasetType, required=False, **kwargs):
         """ Get dimension names in a dataset type.
         Args:
@@ -159,12 +176,14 @@ class ButlerRepository(HuntsmanBase):
         return dataIds
 
     def ingest_raw_files(self, filenames, transfer="symlink", define_visits=False,
-                         skip_existing=True, **kwargs):
+                         skip_existing=True, processes=1, **kwargs):
         """ Ingest raw files into the Butler repository.
         Args:
             filenames (iterable of str): The list of raw data filenames.
             skip_existing (bool, optional): If True (default), do not attempt to ingest exposures
                 that are already present. Else, an error is raised.
+            processes (int, optional): The number of processes used to read the file metadata.
+                Default: 1.
             **kwargs: Parsed to self.get_butler.
         Returns:
             list of dict: List of failed dataIds.
@@ -191,7 +210,7 @@ class ButlerRepository(HuntsmanBase):
 
         # Ingest the files. If there is an error on one file, other files will still be ingested
         try:
-            task.run(filenames, skip_existing_exposures=skip_existing)
+            task.run(filenames, processes=processes, skip_existing_exposures=skip_existing)
         except RuntimeError as err:
             self.logger.error(f"{err}. Proceeding anyway.")
 
@@ -482,14 +501,30 @@ class TemporaryButlerRepository(HuntsmanBase):
     Used as a context manager.
     """
 
-    def __init__(self, prefix=None,  *args, **kwargs):
+    def __init__(self, prefix=None,  *args, template_directory=None, directory=None, **kwargs):
+        """
+        Args:
+            prefix (str, optional): The prefix of the temporary directory.
+            directory (str, optional): The parent of the temporary directory. If None (default),
+                use the system default temporary directory.
+            template_directory (str, optional): If provided, the temporary repository is created
+                by copying this existing butler repository rather than initialising a new one.
+            *args, **kwargs: Parsed to ButlerRepository.
+        """
         self._args = args
         self._kwargs = kwargs
         self._prefix = prefix
+        self._template_directory = template_directory
+        self._directory = directory
         self._tempdir = None
 
     def __enter__(self):
-        self._tempdir = TemporaryDirectory(prefix=self._prefix)
+        self._tempdir = TemporaryDirectory(prefix=self._prefix, dir=self._directory)
+
+        # Copying an initialised repository is much faster than initialising a new one
+        if self._template_directory is not None:
+            shutil.copytree(self._template_directory, self._tempdir.name, dirs_exist_ok=True)
+
         return ButlerRepository(self._tempdir.name, *self._args, **self._kwargs)
 
     def __exit__(self, *args, **kwargs):
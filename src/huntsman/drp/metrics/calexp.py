@@ -53,7 +53,7 @@ def photocal_metadata(calexp, src, **kwargs):
         dict: Dict containing the zeropoint in mags.
     """
     # Find number of sources used for photocal
-    n_sources = sum(src["calib_photometry_used"])
+    n_sources = np.count_nonzero(src["calib_photometry_used"])
 
     # Get the photo calib metadata
     pc = calexp.getPhotoCalib()
@@ -81,7 +81,7 @@ def psf_metadata(calexp, src, **kwargs):
         dict: Dict containing the PSF FWHM in arcsec and ellipticity.
     """
     # Find number of sources used to measure PSF
-    n_sources = sum(src["calib_psf_used"])
+    n_sources = np.count_nonzero(src["calib_psf_used"])
 
     psf = calexp.getPsf()
     shape = psf.computeShape()  # At the average position of the stars used to measure it
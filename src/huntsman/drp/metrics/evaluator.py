@@ -4,7 +4,9 @@ from huntsman.drp.core import get_logger
 class MetricEvaluator():
 
     def __init__(self):
-        self.functions = set()
+        # Functions are evaluated in the order they are added as some depend on others
+        # e.g. alt_az uses the WCS written by get_wcs
+        self.functions = []
         self.logger = get_logger()
 
     def add_function(self, func):
@@ -15,7 +17,8 @@ class MetricEvaluator():
             func (Function): The input function.
         """
         self.logger.debug(f"Adding function to {self}: {func.__name__}")
-        self.functions.add(func)
+        if func not in self.functions:
+            self.functions.append(func)
         return func
 
     def remove_function(self, function_name):
@@ -24,10 +27,25 @@ class MetricEvaluator():
             function_name (str): The name of the function to remove.
         """
         self.logger.debug(f"Removing function from {self}: {function_name}")
-        self.functions = set([f for f in self.functions if f.__name__ != function_name])
+        self.functions = [f for f in self.functions if f.__name__ != function_name]
+
+    def copy(self, ignore=None):
+        """ Return a copy of the evaluator, optionally excluding some functions.
+        This allows functions to be ignored without modifying the shared evaluator.
+        Args:
+            ignore (iterable of str, optional): Names of functions to exclude from the copy.
+        Returns:
+            MetricEvaluator: The new evaluator.
+        """
+        ignore = set() if ignore is None else set(ignore)
+
+        evaluator = self.__class__()
+        evaluator.functions = [f for f in self.functions if f.__name__ not in ignore]
+
+        return evaluator
 
     def evaluate(self, *args, **kwargs):
-        """ Evaluate metrics by calling all funcions with common arguments.
+        """ Evaluate metrics by calling all funcions in order with common arguments.
         Args:
             *args, **kwargs: Parsed to metric function calls.
         Returns:
@@ -196,6 +196,10 @@ class RefcatClient(HuntsmanBase):
         return self
 
     def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def close(self):
+        """ Release the connection to the refcat server. """
         self._proxy._pyroRelease()
 
     def make_reference_catalogue(self, *args, **kwargs):
@@ -207,6 +211,9 @@ class RefcatClient(HuntsmanBase):
 
         filename = kwargs.pop("filename", None)  # file needs to be stored on local volume
 
+        # Pyro proxies are owned by a single thread, so claim it in case the client is reused
+        self._proxy._pyroClaimOwnership()
+
         # Get and decode the data sent over the network
         data = self._proxy.make_reference_catalogue(*args, **kwargs)
         df_bytes = serpent.tobytes(data)
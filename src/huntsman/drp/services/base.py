@@ -8,18 +8,15 @@ Features:
 - Minimal CPU downtime.
 """
 import gc
-import time
 import atexit
 import queue
 from functools import partial
-from threading import Thread
+from threading import Thread, Condition
 from contextlib import suppress
 from multiprocessing import Pool, Event
 from multiprocessing import JoinableQueue as Queue
 from abc import ABC, abstractmethod
 
-from panoptes.utils.time import CountdownTimer
-
 from huntsman.drp.base import HuntsmanBase
 from huntsman.drp.collection import ExposureCollection, CalibCollection
 
@@ -146,6 +143,7 @@ class ProcessQueue(HuntsmanBase, ABC):
         self._n_failed = 0
         self._total_queued = 0
         self._stop_event = Event()
+        self._processed_condition = Condition()  # Notified when an object finishes processing
         self._queued_objs = set()  # Set to keep track of what objects are in the queue
 
         atexit.register(self.stop)  # This gets called when python is quit
@@ -214,12 +212,31 @@ class ProcessQueue(HuntsmanBase, ABC):
         self.logger.info(f"Stopping {self}.")
         self.threads_stopping = True
 
+        # Wake up anything waiting for objects to be processed
+        with self._processed_condition:
+            self._processed_condition.notify_all()
+
         if blocking:
             for thread in self._threads:
                 with suppress(RuntimeError):
                     thread.join()
             self.logger.info(f"{self} stopped.")
 
+    def wait_until_processed(self, n_processed, timeout=None):
+        """ Block until a number of objects have been processed or the service is stopped.
+        Args:
+            n_processed (int): The number of processed objects to wait for.
+            timeout (float, optional): The maximum time to wait in seconds. If None (default),
+                wait indefinitely.
+        Returns:
+            bool: True if the objects were processed, else False.
+        """
+        with self._processed_condition:
+            self._processed_condition.wait_for(
+                lambda: self._n_processed >= n_processed or self.threads_stopping,
+                timeout=timeout)
+            return self._n_processed >= n_processed
+
     @abstractmethod
     def _get_objs(self):
         """ Return a list of objects to process.
@@ -243,12 +260,8 @@ class ProcessQueue(HuntsmanBase, ABC):
             if not self.is_running:
                 self.logger.warning(f"{self} is not running.")
 
-            # Sleep before reporting status again
-            timer = CountdownTimer(duration=self._status_interval)
-            while not timer.expired():
-                if self.threads_stopping:
-                    break
-                time.sleep(1)
+            # Sleep before reporting status again, waking immediately if the service is stopped
+            self._stop_event.wait(timeout=self._status_interval)
 
         self.logger.debug("Status thread stopped.")
 
@@ -277,11 +290,8 @@ class ProcessQueue(HuntsmanBase, ABC):
                     # Increment the total number of objects we have queued
                     self._total_queued += 1
 
-            timer = CountdownTimer(duration=self._queue_interval)
-            while not timer.expired():
-                if self.threads_stopping:
-                    break
-                time.sleep(1)
+            # Sleep before queuing again, waking immediately if the service is stopped
+            self._stop_event.wait(timeout=self._queue_interval)
 
         self.logger.debug("Queue thread stopped.")
 
@@ -328,7 +338,13 @@ class ProcessQueue(HuntsmanBase, ABC):
         obj = result["obj"]
         success = result["success"]
 
-        if hasattr(self, "_on_failure"):
+        if success and hasattr(self, "_on_success"):
+            try:
+                self._on_success(obj)
+            except Exception as err:
+                self.logger.error(f"Error in on_success callback for {obj}: {err!r}")
+
+        elif not success and hasattr(self, "_on_failure"):
             try:
                 self._on_failure(obj)
             except Exception as err:
@@ -337,9 +353,11 @@ class ProcessQueue(HuntsmanBase, ABC):
         success_or_fail = "success" if success else "fail"
         self.logger.info(f"Finished processing {obj} ({success_or_fail}).")
 
-        self._n_processed += 1
-        if not success:
-            self._n_failed += 1
+        with self._processed_condition:
+            self._n_processed += 1
+            if not success:
+                self._n_failed += 1
+            self._processed_condition.notify_all()
 
         self._input_queue.task_done()
         self._output_queue.task_done()
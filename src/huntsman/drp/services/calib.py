@@ -1,12 +1,11 @@
-import os
-import time
 import datetime
-from copy import copy
+from threading import Lock
+from tempfile import TemporaryDirectory
 from multiprocessing.pool import ThreadPool
 
 from huntsman.drp.services.base import ProcessQueue
 from huntsman.drp.utils.date import current_date, parse_date, date_to_ymd
-from huntsman.drp.lsst.butler import TemporaryButlerRepository
+from huntsman.drp.lsst.butler import ButlerRepository, TemporaryButlerRepository
 from huntsman.drp.collection import ExposureCollection, CalibCollection
 
 
@@ -18,7 +17,7 @@ class CalibService(ProcessQueue):
     _pool_class = ThreadPool  # Use ThreadPool as LSST code makes its own subprocesses
 
     def __init__(self, date_begin=None, validity=1, min_exps_per_calib=None,
-                 max_exps_per_calib=None, remake_existing=False, **kwargs):
+                 max_exps_per_calib=None, remake_existing=False, ingest_processes=1, **kwargs):
         """
         Args:
             date_begin (datetime.datetime, optional): Make calibs for this date and after. If None
@@ -31,12 +30,18 @@ class CalibService(ProcessQueue):
                 raw docs will contribute to a single calib. If None (default), no upper-limit is
                 applied.
             remake_existing (bool, optional): If True, remake existing calibs. Default: False.
+            ingest_processes (int, optional): The number of processes used to ingest raw files
+                for each date. Up to nproc dates are processed at once, so the total number of
+                ingest processes can be nproc * ingest_processes. Default: 1.
         """
         super().__init__(**kwargs)
 
         # If this is true then existing calibs will be remade
         self.remake_existing = bool(remake_existing)
 
+        # Dates are already processed in parallel, so by default ingest each date serially
+        self.ingest_processes = int(ingest_processes)
+
         # Set the validity, which determines the frquency that calibs are made
         self.validity = datetime.timedelta(days=validity)
 
@@ -48,7 +53,13 @@ class CalibService(ProcessQueue):
         self._ordered_calib_types = self.config["calibs"]["types"]
         self._min_exps_per_calib = {} if min_exps_per_calib is None else min_exps_per_calib
         self._max_exps_per_calib = {} if max_exps_per_calib is None else max_exps_per_calib
-        self._date = copy(self.date_begin)  # Gets incremented
+        self._date = self.date_begin  # Gets incremented
+
+        # Initialised butler repository that is copied for each date
+        # Keep it on the same filesystem as the copies
+        self._scratch_dir = self.config["directories"].get("scratch")
+        self._template_dir = None
+        self._template_lock = Lock()
 
         # Create collection client objects
         self.exposure_collection = ExposureCollection.from_config(
@@ -81,9 +92,10 @@ class CalibService(ProcessQueue):
             self.logger.info(f"Waiting for date: {valid_date}")
 
             while not self.date_is_valid(date):
-                if self.threads_stopping:
+                # Sleep until the date is valid, waking immediately if the service is stopped
+                remaining = (valid_date - current_date()).total_seconds()
+                if self._stop_event.wait(timeout=min(interval, max(remaining, 0))):
                     return
-                time.sleep(interval)
 
             self.logger.info(f"Finished waiting for date: {valid_date}")
 
@@ -99,6 +111,9 @@ class CalibService(ProcessQueue):
         date_min = date - self.validity
         date_max = date + self.validity
 
+        # All calib docs share the same date, so only format it once
+        date_ymd = date_to_ymd(date)
+
         # Specify common find kwargs
         find_kwargs = {"date_min": date_min,
                        "date_max": date_max,
@@ -115,25 +130,45 @@ class CalibService(ProcessQueue):
 
         # Check that some bias frames exist
         # This allows us to quickly skip dates that we cannot process
-        if not any([d["datasetType"] == "bias" for d in calib_docs]):
+        if not any(d["datasetType"] == "bias" for d in calib_docs):
             self.logger.warning(f"No possible bias calibs for date={date}. Skipping.")
             return
 
         # Figure out which calibs we can ingest / skip processing
         calib_docs_ingest = []
-        if self.remake_existing:
-            calib_docs_process = calib_docs
-        else:
-            calib_docs_process = []
-            for calib_doc in calib_docs:
-                # Get the archived filename. This may not actually exist yet.
-                filename = self.calib_collection.get_calib_filename(calib_doc)
-                if os.path.isfile(filename):
-                    calib_doc["filename"] = filename
-                    calib_docs_ingest.append(calib_doc)
-                else:
-                    calib_docs_process.append(calib_doc)
-            self.logger.debug(f"Skipping {len(calib_docs_ingest)} existing calibs for {date}.")
+        calib_docs_process = []
+        archive_filenames = {}  # Reused when archiving the new calibs
+
+        # Get the filenames of calibs already in the calib collection with a single query
+        archived_filenames = set()
+        listed_filenames = None  # Only list the archive directory if required
+
+        if not self.remake_existing:
+            archived_filenames = set(self.calib_collection.find(date=date, key="filename"))
+
+            # Documents can outlive their files, so check them against a single archive listing
+            if archived_filenames:
+                listed_filenames = self.calib_collection.list_archived_filenames(date_ymd)
+                archived_filenames &= listed_filenames
+
+        for calib_doc in calib_docs:
+            # Get the archived filename. This may not actually exist yet.
+            filename = self.calib_collection.get_calib_filename(calib_doc, date_ymd=date_ymd)
+
+            # Fall back on the archive directory in case files exist without a document
+            if (filename not in archived_filenames) and not self.remake_existing:
+                if listed_filenames is None:
+                    listed_filenames = self.calib_collection.list_archived_filenames(date_ymd)
+                if filename in listed_filenames:
+                    archived_filenames.add(filename)
+
+            if filename in archived_filenames:
+                calib_doc["filename"] = filename
+                calib_docs_ingest.append(calib_doc)
+            else:
+                archive_filenames[calib_doc] = filename
+                calib_docs_process.append(calib_doc)
+        self.logger.debug(f"Skipping {len(calib_docs_ingest)} existing calibs for {date}.")
 
         # Get documents matching the calib docs
         exp_docs = []
@@ -167,72 +202,123 @@ class CalibService(ProcessQueue):
 
             exp_docs.append(docs)
 
+        # Skip creating the butler repository if there are no calibs to construct
+        # Ingesting existing calibs alone is pointless as the repository is temporary
+        if not any(exp_docs):
+            self.logger.info(f"No calibs to construct for {date}. Skipping.")
+            return
+
         # Construct the calibs and archive them
         self.logger.info(f"Constructing calibs for {date}.")
         self._process_documents(calib_docs_process, exp_docs, calib_docs_ingest=calib_docs_ingest,
-                                begin_date=date_min, end_date=date_max)
+                                archive_filenames=archive_filenames, begin_date=date_min,
+                                end_date=date_max)
 
     # Private methods
 
-    def _process_documents(self, calib_docs, exp_docs, calib_docs_ingest=None, **kwargs):
+    def _process_documents(self, calib_docs, exp_docs, calib_docs_ingest=None,
+                           archive_filenames=None, **kwargs):
         """ Create calibs from raw exposures using the LSST stack.
         Args:
             calib_docs (list of CalibDocument): The calibs to process.
             exp_docs (list of ExposureDocument): THe exposures to process. Must be the same length
                 as calib_docs.
+            calib_docs_ingest (list of CalibDocument, optional): Existing calibs to ingest.
+            archive_filenames (dict, optional): Dict of CalibDocument: archive filename. If not
+                provided, archive filenames are determined when archiving.
             **kwargs: Parsed to ButlerRepository.construct_calibs.
         """
-        with TemporaryButlerRepository(config=self.config) as br:
+        template_directory = self._get_template_directory()
+
+        with TemporaryButlerRepository(config=self.config, template_directory=template_directory,
+                                       directory=self._scratch_dir) as br:
 
             # Ingest master calibs that we are not processing
             if calib_docs_ingest:
                 br.ingest_calib_docs(calib_docs_ingest)
 
-            # Loop over calib types in order
-            for calib_type in self._ordered_calib_types:
+            # Ingest all of the raw files at once as many calibs share the same raw exposures
+            # e.g. darks and defects are made from the same raw darks
+            all_raw_filenames = set([d["filename"] for docs in exp_docs if docs for d in docs])
+            if all_raw_filenames:
+                br.ingest_raw_files(all_raw_filenames, processes=self.ingest_processes)
+
+            # Archive the calibs together once they have been made
+            calibs_to_archive = []
+            for filename, metadata in self._construct_calibs(br, calib_docs, exp_docs, **kwargs):
+                archive_filename = archive_filenames.get(metadata) if archive_filenames else None
+                calibs_to_archive.append((filename, metadata, archive_filename))
+
+            if calibs_to_archive:
+                self.logger.info(f"Archiving {len(calibs_to_archive)} calibs.")
+                self.calib_collection.archive_master_calibs(calibs_to_archive)
+
+    def _construct_calibs(self, br, calib_docs, exp_docs, **kwargs):
+        """ Construct calibs in order of their type using ingested raw exposures.
+        Args:
+            br (ButlerRepository): The butler repository containing the ingested raw files.
+            calib_docs (list of CalibDocument): The calibs to process.
+            exp_docs (list of ExposureDocument): The exposures to process.
+            **kwargs: Parsed to ButlerRepository.construct_calibs.
+        Yields:
+            tuple: The (filename, metadata) of each successfully constructed calib.
+        """
+        # Loop over calib types in order
+        for calib_type in self._ordered_calib_types:
+
+            # Loop over calib docs of the correct type
+            for calib_doc, docs in zip(calib_docs, exp_docs):
+                if calib_doc["datasetType"] != calib_type:
+                    continue
+                elif not docs:
+                    continue
 
-                # Loop over calib docs of the correct type
-                for calib_doc, docs in zip(calib_docs, exp_docs):
-                    if calib_doc["datasetType"] != calib_type:
-                        continue
-                    elif not docs:
-                        continue
+                # Break out of loop if necessary
+                if self.threads_stopping:
+                    return
+
+                raw_filenames = [d["filename"] for d in docs]
 
-                    # Break out of loop if necessary
-                    if self.threads_stopping:
-                        return
+                self.logger.debug("Converting documents into LSST dataIds.")
+                calibId = br.document_to_dataId(calib_doc, datasetType=calib_type)
+                dataIds = [br.document_to_dataId(d) for d in docs]
 
-                    # Ingest the raw docs
-                    raw_filenames = [d["filename"] for d in docs]
-                    br.ingest_raw_files(raw_filenames)
+                # Process calibs one by one
+                # This does not make full use of LSST quantum graph but gives us more control
+                self.logger.info(f"Constructing {calib_type} for {calib_doc}.")
+                try:
+                    br.construct_calibs(calib_type, dataIds=dataIds, nproc=1, **kwargs)
 
-                    self.logger.debug("Converting documents into LSST dataIds.")
-                    calibId = br.document_to_dataId(calib_doc, datasetType=calib_type)
-                    dataIds = [br.document_to_dataId(d) for d in docs]
+                # Log error and continue making the other calibs
+                # This may lead to further errors down the line but it is the best we can do
+                except Exception as err:
+                    self.logger.error(
+                        f"Error while constructing {calib_type} for {calib_doc}: {err!r}")
+                    continue
 
-                    # Process calibs one by one
-                    # This does not make full use of LSST quantum graph but gives us more control
-                    self.logger.info(f"Constructing {calib_type} for {calib_doc}.")
-                    try:
-                        br.construct_calibs(calib_type, dataIds=dataIds, nproc=1, **kwargs)
+                # Use butler to get the calib filename
+                filename = br.get_filenames(calib_type, dataId=calibId)[0]
 
-                    # Log error and continue making the other calibs
-                    # This may lead to further errors down the line but it is the best we can do
-                    except Exception as err:
-                        self.logger.error(
-                            f"Error while constructing {calib_type} for {calib_doc}: {err!r}")
-                        continue
+                # Create calib metadata
+                metadata = calib_doc.copy()
+                metadata["raw_filenames"] = raw_filenames
 
-                    # Use butler to get the calib filename
-                    filename = br.get_filenames(calib_type, dataId=calibId)[0]
+                yield filename, metadata
 
-                    # Create calib metadata
-                    metadata = calib_doc.copy()
-                    metadata["raw_filenames"] = raw_filenames
+    def _get_template_directory(self):
+        """ Get the directory of an initialised butler repository, creating it if necessary.
+        Initialising a butler repository is slow, so it is only done once and the result is
+        copied for each date.
+        Returns:
+            str: The template repository directory.
+        """
+        with self._template_lock:
+            if self._template_dir is None:
+                template_dir = TemporaryDirectory(prefix="calib_template_", dir=self._scratch_dir)
+                ButlerRepository(template_dir.name, config=self.config, logger=self.logger)
+                self._template_dir = template_dir
 
-                    # Archive the calib in the calib collection
-                    self.logger.info(f"Archiving {calib_type} for {calib_doc}.")
-                    self.calib_collection.archive_master_calib(filename=filename, metadata=metadata)
+        return self._template_dir.name
 
     def _get_objs(self):
         """ Queue all dates that are valid and have not already been queued.
@@ -242,7 +328,7 @@ class CalibService(ProcessQueue):
 
         valid_dates = []
         while self.date_is_valid(self._date):
-            valid_dates.append(copy(self._date))
+            valid_dates.append(self._date)
             self._date += self.validity
 
         return valid_dates
@@ -1,5 +1,8 @@
+import os
+
 from huntsman.drp.services.base import ProcessQueue
-from huntsman.drp.utils.ingest import list_fits_files_recursive, METRIC_SUCCESS_FLAG
+from huntsman.drp.utils.ingest import (scan_fits_directory, find_fpack_duplicates,
+                                       METRIC_SUCCESS_FLAG)
 
 __all__ = ("FileIngestor",)
 
@@ -16,13 +19,16 @@ def ingest_file(filename, exposure_collection, **kwargs):
 class FileIngestor(ProcessQueue):
     """ Class to watch for new file entries in database and process their metadata. """
 
-    def __init__(self, directory, nproc=1, *args, **kwargs):
+    def __init__(self, directory, nproc=1, refresh_interval=10, *args, **kwargs):
         """
         Args:
             directory (str): The top level directory to watch for new files, so they can
                 be added to the relevant datatable.
             nproc (int): The number of processes to use. If None (default), will check the config
                 item `screener.nproc` with a default value of 1.
+            refresh_interval (int, optional): Refresh the set of ingested files from the
+                collection and fully rescan the directory every this many queue cycles.
+                Default: 10.
             *args, **kwargs: Parsed to ProcessQueue initialiser.
         """
         super().__init__(*args, **kwargs)
@@ -37,27 +43,97 @@ class FileIngestor(ProcessQueue):
         # Create container for failed files
         self.files_failed = set()
 
+        # Cache of successfully ingested files, updated as files are processed
+        self._files_ingested = set()
+        self._refresh_interval = int(refresh_interval)
+        self._n_cycles = 0
+
+        # Cache of FITS files in the directory, updated incrementally
+        # The directory cache stores (mtime, filenames, subdirectories) for each directory
+        self._files_in_directory = set()
+        self._directory_cache = {}
+
     def _async_process_objects(self, *args, **kwargs):
         """ Continually process objects in the queue. """
         return super()._async_process_objects(process_func=ingest_file)
 
     def _get_objs(self):
         """ Get list of files to process. """
+        refresh = self._n_cycles % self._refresh_interval == 0
+
         # Get set of all files in watched directory
-        files_in_directory = set(list_fits_files_recursive(self._directory))
+        self._update_files_in_directory(full_rescan=refresh)
+        files_in_directory = self._files_in_directory.copy()
         self.logger.debug(f"Found {len(files_in_directory)} FITS files in {self._directory}.")
 
-        # Get set of all files that are ingested and pass screening
-        doc_filter = {METRIC_SUCCESS_FLAG: True}
-        files_ingested = set(self.exposure_collection.find(doc_filter, key="filename"))
+        # Only ingest the fpacked version of files that exist in both formats
+        duplicates = find_fpack_duplicates(files_in_directory)
+        if duplicates:
+            self.logger.debug(f"Skipping {len(duplicates)} files with fpacked duplicates.")
+            files_in_directory -= duplicates
+
+        # Periodically get set of all files that are ingested and pass screening
+        # This picks up any changes made to the collection by other processes
+        if refresh:
+            doc_filter = {METRIC_SUCCESS_FLAG: True}
+            self._files_ingested = set(self.exposure_collection.find(doc_filter, key="filename"))
+        self._n_cycles += 1
 
         # Identify files that require processing
-        files_to_process = files_in_directory - files_ingested - self.files_failed
+        files_to_process = files_in_directory - self._files_ingested - self.files_failed
         self.logger.debug(f"Found {len(files_to_process)} files requiring processing.")
 
         return files_to_process
 
+    def _on_success(self, filename):
+        """ Callback function for successful file ingestion. """
+        self._files_ingested.add(filename)
+
     def _on_failure(self, filename):
         """ Callback function for failed file ingestion. """
         self.logger.debug(f"Adding {filename} to failed files.")
         self.files_failed.add(filename)
+
+    def _update_files_in_directory(self, full_rescan=False):
+        """ Update the set of FITS files in the watched directory.
+        Directories are only listed if their modification time has changed, as adding or removing
+        an entry updates the modification time of its parent directory.
+        Args:
+            full_rescan (bool, optional): If True, list every directory regardless of whether it
+                has been modified. This catches changes missed by coarse mtime resolution.
+                Default: False.
+        """
+        if full_rescan:
+            self._files_in_directory = set()
+            self._directory_cache = {}
+
+        old_cache = self._directory_cache
+        new_cache = {}
+
+        dirpaths = [self._directory]
+        while dirpaths:
+            dirpath = dirpaths.pop()
+
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+                cached = old_cache.get(dirpath)
+
+                if cached is None or cached[0] != mtime:
+                    filenames, subdirectories = scan_fits_directory(dirpath)
+                    if cached is not None:
+                        self._files_in_directory -= cached[1]
+                    self._files_in_directory |= filenames
+                    cached = (mtime, filenames, subdirectories)
+
+            # The directory may have been removed since its parent was listed
+            except FileNotFoundError:
+                continue
+
+            new_cache[dirpath] = cached
+            dirpaths.extend(cached[2])
+
+        # Forget files in directories that no longer exist
+        for dirpath in old_cache.keys() - new_cache.keys():
+            self._files_in_directory -= old_cache[dirpath][1]
+
+        self._directory_cache = new_cache
@@ -1,12 +1,11 @@
 import os
-import time
-from threading import Thread
+from collections import defaultdict
+from functools import cached_property
+from threading import Thread, Event
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-from panoptes.utils.time import CountdownTimer
-
 from huntsman.drp.base import HuntsmanBase
 from huntsman.drp.collection import ExposureCollection, CalibCollection
 
@@ -40,9 +39,27 @@ class Plotter(HuntsmanBase):
         self._calib_collection = CalibCollection(config=self.config)
 
         find_kwargs = {} if find_kwargs is None else find_kwargs
-        self._rawdocs = self._exposure_collection.find(**find_kwargs)
+
+        # Only retrieve the raw document fields that are needed to make the plots
+        raw_find_kwargs = {"projection": self._get_projection(), **find_kwargs}
+        self._rawdocs = self._exposure_collection.find(**raw_find_kwargs)
         self._caldocs = self._calib_collection.find(**find_kwargs)
 
+    # Properties
+
+    @cached_property
+    def _camera_names(self):
+        """ List of camera names in config order. """
+        return [c["camera_name"] for c in self.config["cameras"]["devices"]]
+
+    @cached_property
+    def _rawdocs_by_filter(self):
+        """ Dict of filter_name: list of raw documents. """
+        rawdocs_by_filter = defaultdict(list)
+        for d in self._rawdocs:
+            rawdocs_by_filter[d[FILTER_KEY]].append(d)
+        return dict(rawdocs_by_filter)
+
     # Public methods
 
     def makeplots(self):
@@ -78,6 +95,9 @@ class Plotter(HuntsmanBase):
 
         # Filter documents that have both data for x key and y key
         docs = [d for d in docs if (d.get(x_key) is not None) and (d.get(y_key) is not None)]
+        if not docs:
+            self.logger.warning(f"No {x_key} and {y_key} data to make plot for {basename}.")
+            return
 
         docs_by_camera = self._get_docs_by_camera(docs)
 
@@ -85,10 +105,11 @@ class Plotter(HuntsmanBase):
         x_values_by_camera, xmin, xmax = self._get_values_by_camera(x_key, docs_by_camera)
         y_values_by_camera, ymin, ymax = self._get_values_by_camera(y_key, docs_by_camera)
 
-        if not any([_ for _ in x_values_by_camera.values()]):
+        # Min / max values are only finite if there is data to plot
+        if not np.isfinite(xmin):
             self.logger.warning(f"No {x_key} data to make plot for {basename}.")
             return
-        if not any([_ for _ in y_values_by_camera.values()]):
+        if not np.isfinite(ymin):
             self.logger.warning(f"No {y_key} data to make plot for {basename}.")
             return
 
@@ -117,40 +138,46 @@ class Plotter(HuntsmanBase):
             y_key (str): Flattened name of the document field to plot on the y-axis.
             **kwargs: Parsed to self.plot_by_camera.
         """
-        filter_names = set([d[FILTER_KEY] for d in self._rawdocs])
-
-        for filter_name in filter_names:
-            docs = [d for d in self._rawdocs if d[FILTER_KEY] == filter_name]
+        for filter_name, docs in self._rawdocs_by_filter.items():
             basename = f"{x_key}_{y_key}-{filter_name}"
             self.plot_by_camera(x_key, y_key, basename=basename, docs=docs, **kwargs)
 
-    def plot_hist_by_camera(self, key, basename=None, docs=None, **kwargs):
+    def plot_hist_by_camera(self, key, basename=None, docs=None, bins=10, **kwargs):
         """ Plot histograms of quantities by camera.
         Args:
             key (str): Flattened name of the document field to plot.
             basename (str, optional): The file basename. If not provided, key is used.
             docs (list of Document, optional): A list of documents to plot. If None, will use
                 self._rawdocs.
-            **kwargs: Parsed to matplotlib.pyplot.
+            bins (int or array, optional): The number of bins or the bin edges. Default: 10.
+            **kwargs: Parsed to matplotlib.pyplot.hist.
         """
         basename = basename if basename is not None else key
 
         if docs is None:
             docs = self._rawdocs
+        if not docs:
+            self.logger.warning(f"No documents to make hist for {basename}.")
+            return
+
         docs_by_camera = self._get_docs_by_camera(docs)
 
         # Get dict of values organised by camera name
         values_by_camera, vmin, vmax = self._get_values_by_camera(key, docs_by_camera)
 
-        if not any([_ for _ in values_by_camera.values()]):
+        # Min / max values are only finite if there is data to plot
+        if not np.isfinite(vmin):
             self.logger.warning(f"No {key} data to make hist for {basename}.")
             return
 
+        # All cameras share the same bins
+        edges = np.histogram_bin_edges([], bins=bins, range=(vmin, vmax))
+
         # Make the plot
         fig, axes = self._make_fig_by_camera(n_cameras=len(values_by_camera))
 
         for (ax, (cam_name, values)) in zip(axes, values_by_camera.items()):
-            ax.hist(values, range=(vmin, vmax), **kwargs)
+            ax.hist(values[np.isfinite(values)], bins=edges, **kwargs)
             ax.set_title(f"{cam_name}")
         fig.suptitle(basename)
 
@@ -162,13 +189,23 @@ class Plotter(HuntsmanBase):
             key (str): The flattened key to plot.
             **kwargs: Parsed to self.plot_hist_by_camera.
         """
-        filter_names = set([d[FILTER_KEY] for d in self._rawdocs])
-
-        for filter_name in filter_names:
-            docs = [d for d in self._rawdocs if d[FILTER_KEY] == filter_name]
+        for filter_name, docs in self._rawdocs_by_filter.items():
             basename = f"{key}-{filter_name}"
             self.plot_hist_by_camera(key, basename=basename, docs=docs, **kwargs)
 
+    def _get_projection(self):
+        """ Get the document fields required to make the plots.
+        Returns:
+            set of str: The flattened field names.
+        """
+        projection = set(["filename", "detector_name", FILTER_KEY])
+
+        for plot_kwargs_list in self._plot_configs.values():
+            for plot_kwargs in plot_kwargs_list:
+                projection.update([plot_kwargs[k] for k in ("x_key", "y_key", "key")
+                                   if k in plot_kwargs])
+        return projection
+
     def _get_docs_by_camera(self, docs):
         """ Return dict of documents with keys of camera name.
         Args:
@@ -176,19 +213,20 @@ class Plotter(HuntsmanBase):
         Returns:
             dict: Dict of camera_name: list of docs.
         """
-        # Get camera names corresponding to CCD numbers
-        cam_names = [c["camera_name"] for c in self.config["cameras"]["devices"]]
+        # Group the documents by camera name in a single pass
+        docs_by_detector = defaultdict(list)
+        for d in docs:
+            docs_by_detector[d["detector_name"]].append(d)
 
         docs_by_camera = {}
-        for cam_name in cam_names:
+        for cam_name in self._camera_names:
 
-            camera_docs = [d for d in docs if d["detector_name"] == cam_name]
             # Drop any cameras with no documents (e.g. testing cameras)
-            if not camera_docs:
+            if cam_name not in docs_by_detector:
                 self.logger.debug(f"No matching documents for camera {cam_name}.")
                 continue
 
-            docs_by_camera[cam_name] = camera_docs
+            docs_by_camera[cam_name] = docs_by_detector[cam_name]
 
         return docs_by_camera
 
@@ -198,24 +236,26 @@ class Plotter(HuntsmanBase):
             key (str): The name of the quantity to get.
             docs_by_camera (dict): Dict of cam_name: docs.
         Returns:
-            dict: Dict of camera_name: list of values.
-            float: The minimum value of all values
-            flat: The maximum value of all values.
+            dict: Dict of camera_name: array of values. Missing values are NaN.
+            float: The minimum value of all values. Infinite if there are no values.
+            flat: The maximum value of all values. Infinite if there are no values.
         """
         # Get dict of values organised by camera name
         values_by_camera = {}
-        vmax = -np.inf
-        vmin = np.inf
         for cam_name, docs in docs_by_camera.items():
 
-            # Some measurements may be missing and get will return None
-            values = [v for v in [d.get(key) for d in docs] if v is not None]
-            values_by_camera[cam_name] = values
+            # Some measurements may be missing and get will return None, which is converted to NaN
+            values_by_camera[cam_name] = np.array([d.get(key) for d in docs], dtype="float64")
 
-            # Update min / max for common range
-            if values:
-                vmin = min(np.nanmin(values), vmin)
-                vmax = max(np.nanmax(values), vmax)
+        # Get min / max for common range across all cameras
+        vmax = -np.inf
+        vmin = np.inf
+        if values_by_camera:
+            all_values = np.concatenate(list(values_by_camera.values()))
+            all_values = all_values[np.isfinite(all_values)]
+            if all_values.size:
+                vmin = all_values.min()
+                vmax = all_values.max()
 
         return values_by_camera, vmin, vmax
 
@@ -230,16 +270,15 @@ class Plotter(HuntsmanBase):
             list of matplotlib.pyplot.Axes: The axes for each subplot.
         """
         n_row = int((n_cameras - 1) / n_col) + 1
-        fig = plt.figure(figsize=(n_col * figsize, n_row * figsize))
+        fig, axes = plt.subplots(n_row, n_col, figsize=(n_col * figsize, n_row * figsize),
+                                 squeeze=False)
+        axes = axes.ravel().tolist()
 
-        axes = []
-        for i in range(n_row):
-            for j in range(n_col):
-                idx = i * n_col + j
-                if idx < n_cameras:
-                    axes.append(fig.add_subplot(n_row, n_col, idx + 1))
+        # Hide any unused panels
+        for ax in axes[n_cameras:]:
+            ax.set_visible(False)
 
-        return fig, axes
+        return fig, axes[:n_cameras]
 
     def _savefig(self, fig, basename, dpi=150, tight_layout=True):
         """ Save figure to images directory.
@@ -258,6 +297,9 @@ class Plotter(HuntsmanBase):
 
         fig.savefig(filename, dpi=dpi, bbox_inches="tight")
 
+        # Release the figure so pyplot does not keep every figure alive
+        plt.close(fig)
+
 
 class PlotterService(HuntsmanBase):
     """ Class to routinely update plots from multiple plotters specified in the config. """
@@ -266,7 +308,7 @@ class PlotterService(HuntsmanBase):
         super().__init__(**kwargs)
         self.plotters = self._create_plotters()
 
-        self._stop_threads = True
+        self._stop_event = Event()
         self._sleep_interval = sleep_interval * 3600
         self._run_thread = Thread(target=self._run)
 
@@ -282,25 +324,21 @@ class PlotterService(HuntsmanBase):
     def stop(self):
         """ Stop the service. """
         self.logger.debug(f"Stopping {self}.")
-        self._stop_threads = True
-        self._run_thread.join()
+        self._stop_event.set()
+        if self._run_thread.is_alive():
+            self._run_thread.join()
         self.logger.info(f"{self} stopped.")
 
     def _run(self):
         """ Continually update plots until the service is stopped. """
-        self._stop_threads = False
-
-        while True:
+        while not self._stop_event.is_set():
             for plotter in self.plotters:
                 plotter.makeplots()
 
             self.logger.debug(f"Sleeping for {self._sleep_interval}s.")
 
-            timer = CountdownTimer(self._sleep_interval)
-            while not timer.expired():
-                if self._stop_threads:
-                    return
-                time.sleep(1)
+            # Returns early if the service is stopped
+            self._stop_event.wait(timeout=self._sleep_interval)
 
     def _create_plotters(self):
         """ Create a list of plotters from the config. """
@@ -1,8 +1,10 @@
 import tempfile
+from threading import Lock, BoundedSemaphore
+from tempfile import TemporaryDirectory
 from multiprocessing.pool import ThreadPool
 
 from huntsman.drp.services.base import ProcessQueue
-from huntsman.drp.lsst.butler import TemporaryButlerRepository
+from huntsman.drp.lsst.butler import ButlerRepository, TemporaryButlerRepository
 from huntsman.drp.refcat import RefcatClient
 from huntsman.drp.metrics.calexp import metric_evaluator
 from huntsman.drp.collection import ExposureCollection, CalibCollection
@@ -22,12 +24,21 @@ class QualityMonitor(ProcessQueue):
     """
     _pool_class = ThreadPool  # Use ThreadPool as LSST code makes its own subprocesses
 
-    def __init__(self, nproc=None, timeout=None, pipeline_config=None, *args, **kwargs):
+    def __init__(self, nproc=None, nrepos=None, timeout=None, pipeline_config=None, *args,
+                 **kwargs):
         """
         Args:
             nproc (int): The number of processes to use. If None (default), will check the config
                 item `calexp-monitor.nproc` with a default value of 1.
+            nrepos (int): The maximum number of temporary butler repositories that can exist at
+                once. If None (default), will check the config item `calexp-monitor.nrepos` with
+                a default value of nproc.
         """
+        # The refcat client is created when first needed and reused between documents
+        # The refcat server processes one request at a time, so sharing it costs nothing
+        self._refcat_client = None
+        self._refcat_lock = Lock()
+
         super().__init__(*args, **kwargs)
 
         calexp_config = self.config.get("calexp-monitor", {})
@@ -38,6 +49,12 @@ class QualityMonitor(ProcessQueue):
         self.nproc = int(nproc)
         self.logger.debug(f"Calexp monitor using {nproc} processes.")
 
+        # Limit the number of concurrent butler repositories to reduce scratch disk contention
+        # Other workers can still retrieve reference catalogues while they wait
+        if nrepos is None:
+            nrepos = calexp_config.get("nrepos", self.nproc)
+        self._repository_semaphore = BoundedSemaphore(max(1, int(nrepos)))
+
         # Specify timeout for calexp processing
         # TODO: Actually implement this downstream
         self._timeout = timeout if timeout is not None else calexp_config.get("timeout", None)
@@ -45,12 +62,31 @@ class QualityMonitor(ProcessQueue):
         # Set pipeline config overrides
         self.pipeline_config = pipeline_config
 
+        # Use the scratch directory for temporary files if one is configured
+        self._scratch_dir = self.config["directories"].get("scratch")
+
+        # Initialised butler repository that is copied for each document
+        self._template_dir = None
+        self._template_lock = Lock()
+
         # Create collection client objects
         self.exposure_collection = ExposureCollection.from_config(self.config)
         self.calib_collection = CalibCollection.from_config(self.config)
 
     # Public methods
 
+    def stop(self, *args, **kwargs):
+        """ Stop the service and release the refcat client.
+        Args:
+            *args, **kwargs: Parsed to ProcessQueue.stop.
+        """
+        super().stop(*args, **kwargs)
+
+        with self._refcat_lock:
+            if self._refcat_client is not None:
+                self._refcat_client.close()
+                self._refcat_client = None
+
     def process_document(self, document, **kwargs):
         """ Create a calibrated exposure (calexp) for the given data ID and store the metadata.
         Args:
@@ -66,47 +102,33 @@ class QualityMonitor(ProcessQueue):
         # This is necessary as the tempfile module is apparently creating duplicates(!)
         directory_prefix = str(document["detector_exposure_id"])
 
-        with TemporaryButlerRepository.from_config(self.config, prefix=directory_prefix) as br:
+        with tempfile.NamedTemporaryFile(prefix=directory_prefix, dir=self._scratch_dir) as tf, \
+                ThreadPool(1) as pool:
 
-            # Ingest raw science exposure into the bulter repository
-            self.logger.debug(f"Ingesting raw data for {document}")
-            br.ingest_raw_files([document["filename"]])
+            # Make the reference catalogue in the background while ingesting the other data
+            # The refcat is made by a remote server so does not compete with the butler
+            self.logger.debug(f"Making refcat for {document}")
+            refcat_result = pool.apply_async(self._make_refcat, (document, tf.name))
 
-            # Ingest the corresponding master calibs
-            self.logger.debug(f"Ingesting master calibs for {document}")
-            for calib_type, calib_doc in calib_docs.items():
-                calib_filename = calib_doc["filename"]
-                br.ingest_calibs(datasetType=calib_type, filenames=[calib_filename])
+            # Copy an initialised repository rather than making a new one for each document
+            repo_kwargs = {"prefix": directory_prefix,
+                           "directory": self._scratch_dir,
+                           "template_directory": self._get_template_directory()}
 
-            # Make and ingest the reference catalogue
-            self.logger.debug(f"Making refcat for {document}")
-            with tempfile.NamedTemporaryFile(prefix=directory_prefix) as tf:
-                with RefcatClient.from_config(self.config) as refcat_client:
-                    refcat_client.make_from_documents([document], filename=tf.name)
-                    br.ingest_reference_catalogue([tf.name])
-
-            # Make the calexp
-            self.logger.debug(f"Making calexp for {document}")
-            dataId = br.document_to_dataId(document)
-            br.construct_calexps(dataIds=[dataId], config=self.pipeline_config)
-
-            # Retrieve the calexp results
-            self.logger.debug(f"Reading calexp outputs for {document}")
-            dataId = br.document_to_dataId(document, datasetType="calexp")
-            outputs = {}
-            for output_name in ("calexp", "src", "calexpBackground"):
-                outputs[output_name] = br.get(output_name, dataId=dataId)
-
-            # Evaluate metrics
-            self.logger.debug(f"Calculating metrics for {document}")
-            metrics, success = metric_evaluator.evaluate(**outputs)
+            with self._repository_semaphore, \
+                    TemporaryButlerRepository.from_config(self.config, logger=self.logger,
+                                                          **repo_kwargs) as br:
+                metrics, success = self._make_calexp(br, document, calib_docs, refcat_result,
+                                                     refcat_filename=tf.name)
 
         # Mark processing complete
         metrics[CALEXP_METRIC_TRIGGER] = False
 
         # Update the existing document with calexp metrics
         to_update = {"metrics": {"calexp": metrics}}
-        self.exposure_collection.update_one(document_filter=document, to_update=to_update)
+        # Match on the filename only, which is covered by the unique index
+        self.exposure_collection.update_one(document_filter={"filename": document["filename"]},
+                                            to_update=to_update)
 
         # Raise an exception if not success
         if not success:
@@ -118,26 +140,89 @@ class QualityMonitor(ProcessQueue):
         """ Continually process objects in the queue. """
         return super()._async_process_objects(process_func=self.process_document)
 
-    def _get_objs(self):
-        """ Update the set of data IDs that require processing. """
-        docs = self.exposure_collection.find({"observation_type": "science"},
-                                             quality_filter=True)
-        return [d for d in docs if self._requires_processing(d)]
-
-    def _requires_processing(self, document):
-        """ Check if a document requires processing.
+    def _make_calexp(self, br, document, calib_docs, refcat_result, refcat_filename):
+        """ Make the calexp for a document and evaluate its metrics.
         Args:
-            document (Document): The document to check.
+            br (ButlerRepository): The temporary butler repository.
+            document (ExposureDocument): The document to process.
+            calib_docs (dict): The matching calib documents, keyed by datasetType.
+            refcat_result (multiprocessing.pool.AsyncResult): The result of making the refcat.
+            refcat_filename (str): The filename of the reference catalogue.
+        Returns:
+            dict: The calexp metrics.
+            bool: True if the metric evaluation was successful, else False.
+        """
+        # Ingest raw science exposure into the bulter repository
+        self.logger.debug(f"Ingesting raw data for {document}")
+        br.ingest_raw_files([document["filename"]])
+
+        # Ingest the corresponding master calibs
+        self.logger.debug(f"Ingesting master calibs for {document}")
+        for calib_type, calib_doc in calib_docs.items():
+            calib_filename = calib_doc["filename"]
+            br.ingest_calibs(datasetType=calib_type, filenames=[calib_filename])
+
+        # Ingest the reference catalogue, re-raising any errors from making it
+        refcat_result.get()
+        br.ingest_reference_catalogue([refcat_filename])
+
+        # Make the calexp
+        self.logger.debug(f"Making calexp for {document}")
+        dataId = br.document_to_dataId(document)
+        br.construct_calexps(dataIds=[dataId], config=self.pipeline_config)
+
+        # Retrieve the calexp results
+        self.logger.debug(f"Reading calexp outputs for {document}")
+        dataId = br.document_to_dataId(document, datasetType="calexp")
+        outputs = br.get_many(("calexp", "src", "calexpBackground"), dataId=dataId)
+
+        # Evaluate metrics
+        self.logger.debug(f"Calculating metrics for {document}")
+        metrics, success = metric_evaluator.evaluate(**outputs)
+
+        return metrics, success
+
+    def _get_template_directory(self):
+        """ Get the directory of an initialised butler repository, creating it if necessary.
+        Initialising a butler repository is slow, so it is only done once and the result is
+        copied for each document.
         Returns:
-            bool: True if processing required, else False.
+            str: The template repository directory.
         """
-        if "metrics" not in document:
-            return True
+        with self._template_lock:
+            if self._template_dir is None:
+                template_dir = TemporaryDirectory(prefix="calexp_template_", dir=self._scratch_dir)
+                ButlerRepository(template_dir.name, config=self.config, logger=self.logger)
+                self._template_dir = template_dir
 
-        if "calexp" not in document["metrics"]:
-            return True
+        return self._template_dir.name
+
+    def _make_refcat(self, document, filename):
+        """ Make the reference catalogue for a document using the refcat server.
+        Args:
+            document (ExposureDocument): The document.
+            filename (str): The filename of the output reference catalogue.
+        """
+        with self._refcat_lock:
 
-        if CALEXP_METRIC_TRIGGER not in document["metrics"]["calexp"]:
-            return True
+            if self._refcat_client is None:
+                self._refcat_client = RefcatClient.from_config(self.config, logger=self.logger)
+
+            try:
+                self._refcat_client.make_from_documents([document], filename=filename)
+
+            # Reconnect for the next document in case the connection is broken
+            except Exception:
+                self._refcat_client.close()
+                self._refcat_client = None
+                raise
+
+    def _get_objs(self):
+        """ Update the set of data IDs that require processing.
+        Documents require processing unless their calexp metric trigger is explicitly False. This
+        is checked by the database so that processed documents are not retrieved.
+        """
+        document_filter = {"observation_type": "science",
+                           f"metrics.calexp.{CALEXP_METRIC_TRIGGER}": {"$ne": False}}
 
-        return bool(document["metrics"]["calexp"][CALEXP_METRIC_TRIGGER])
+        return self.exposure_collection.find(document_filter, quality_filter=True)
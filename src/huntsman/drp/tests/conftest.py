@@ -62,47 +62,65 @@ def testing_refcat_server(session_config, refcat_filename):
 # Testing data
 
 
-@pytest.fixture(scope="function")
-def exposure_collection(tmp_path_factory, config):
-    """
-    Create a temporary directory populated with fake FITS images, then parse the images into the
-    raw data table.
+@pytest.fixture(scope="session")
+def fake_exposure_sequence(tmp_path_factory, session_config):
+    """ Generate the fake FITS images once and share them between tests.
+    Tests must not modify the files in this directory.
     """
-    # Generate the fake data
     tempdir = tmp_path_factory.mktemp("test_exposure_sequence")
-    expseq = testing.FakeExposureSequence(config=config)
+    expseq = testing.FakeExposureSequence(config=session_config)
     expseq.generate_fake_data(directory=tempdir)
+    return expseq
+
+
+@pytest.fixture(scope="function")
+def exposure_collection(fake_exposure_sequence, config):
+    """
+    Parse the shared fake FITS images into the raw data table.
+    """
+    expseq = fake_exposure_sequence
 
     # Prepare the database
     exposure_collection = ExposureCollection(config=config, collection_name="fake_data")
     exposure_collection.delete_all(really=True)
 
     # Ingest the data into the collection
-    for filename, header in expseq.header_dict.items():
-        exposure_collection.ingest_file(filename=filename)
+    exposure_collection.ingest_files(expseq.header_dict.keys(), nproc=4)
 
     # Make sure table has the correct number of rows
     assert exposure_collection.count_documents() == expseq.file_count
     yield exposure_collection
 
     # Remove the metadata from the DB ready for other tests
+    exposure_collection.delete_all(really=True, drop=True)
+
+
+@pytest.fixture(scope="session")
+def real_data_documents(session_config):
+    """ Ingest the real testing images once and return the resulting documents.
+    Calculating the metrics is slow, so the documents are reused between tests.
+    """
+    exposure_collection = testing.create_test_exposure_collection(session_config, clear=True)
+    documents = exposure_collection.find()
     exposure_collection.delete_all(really=True)
+    return documents
 
 
 @pytest.fixture(scope="function")
-def exposure_collection_real_data(session_config):
+def exposure_collection_real_data(session_config, real_data_documents):
     """
-    Create a temporary directory populated with fake FITS images, then parse the images into the
-    raw data table.
+    Populate the raw data table with documents for the real testing images.
     """
     # Populate the database
-    exposure_collection = testing.create_test_exposure_collection(session_config, clear=True)
+    exposure_collection = ExposureCollection(config=session_config)
+    exposure_collection.delete_all(really=True)
+    exposure_collection.insert_many(real_data_documents)
 
     yield exposure_collection
 
     # Remove the metadata from the DB ready for other tests
     exposure_collection.logger.info("Deleting all documents after test.")
-    exposure_collection.delete_all(really=True)
+    exposure_collection.delete_all(really=True, drop=True)
     assert not exposure_collection.find()
 
 
@@ -116,7 +134,7 @@ def calib_collection_real_data(session_config):
     yield calib_collection
 
     # Remove the metadata from the DB ready for other tests
-    calib_collection.delete_all(really=True)
+    calib_collection.delete_all(really=True, drop=True)
     assert not calib_collection.find()
 
 
@@ -124,7 +142,7 @@ def calib_collection_real_data(session_config):
 def ref_calib_collection(config):
     collection = ReferenceCalibCollection.from_config(config)
     yield collection
-    collection.delete_all(really=True)
+    collection.delete_all(really=True, drop=True)
     assert not collection.find()
 
 
@@ -144,17 +162,12 @@ def tempdir_and_exposure_collection_with_uningested_files(tmp_path_factory, conf
     expseq.generate_fake_data(directory=tempdir)
 
     # Populate the database
-    n_stop = len(expseq.header_dict) * 0.7 // 1  # ingest ~70% of the files
-    n = 0
-    for filename, header in expseq.header_dict.items():
-        if n >= n_stop:
-            break
-        exposure_collection.ingest_file(filename=filename)
-        n += 1
+    n_stop = int(len(expseq.header_dict) * 0.7)  # ingest ~70% of the files
+    exposure_collection.ingest_files(list(expseq.header_dict.keys())[:n_stop], nproc=4)
 
     # Make sure table has the correct number of rows
     assert exposure_collection.count_documents() == n_stop
     yield (tempdir, exposure_collection)
 
     # Remove the metadata from the DB ready for other tests
-    exposure_collection.delete_all(really=True)
+    exposure_collection.delete_all(really=True, drop=True)
@@ -1,3 +1,5 @@
+from collections import Counter
+
 from huntsman.drp.utils.date import current_date
 from huntsman.drp.lsst.butler import TemporaryButlerRepository
 
@@ -38,6 +40,24 @@ def test_ingest(exposure_collection, config):
         assert len(data_ids) == n_dark
 
 
+def test_template_repository(exposure_collection, config):
+    """ Check a temporary repository can be copied from an initialised template. """
+
+    filenames = exposure_collection.find(key="filename")
+
+    with TemporaryButlerRepository(config=config) as template:
+
+        kwargs = {"config": config, "template_directory": template.root_directory}
+        with TemporaryButlerRepository(**kwargs) as br:
+            assert br.root_directory != template.root_directory
+
+            br.ingest_raw_files(filenames)
+            assert len(br.get_dataIds("raw")) == len(filenames)
+
+        # The template should not be modified
+        assert len(template.get_dataIds("raw")) == 0
+
+
 def test_make_master_calibs(exposure_collection, config):
     """ Check we can create master calibs and in the correct number. """
 
@@ -49,7 +69,8 @@ def test_make_master_calibs(exposure_collection, config):
 
     # Get corresponding calib documents
     calib_date = current_date()
-    calib_docs = set([exposure_collection.raw_doc_to_calib_doc(d, calib_date) for d in docs])
+    calib_docs = {exposure_collection.raw_doc_to_calib_doc(d, calib_date) for d in docs}
+    n_calibs_by_type = Counter(d["datasetType"] for d in calib_docs)
 
     with TemporaryButlerRepository(config=config) as br:
 
@@ -59,7 +80,7 @@ def test_make_master_calibs(exposure_collection, config):
 
             # Defects are made from raw darks
             datasetType2 = "dark" if datasetType == "defects" else datasetType
-            n_expected = len([d for d in calib_docs if d["datasetType"] == datasetType2])
+            n_expected = n_calibs_by_type[datasetType2]
             assert n_expected > 0
 
             # Make the calibs
@@ -1,6 +1,8 @@
 import os
 import time
 import pytest
+from copy import deepcopy
+from multiprocessing.pool import ThreadPool
 
 from panoptes.utils.time import CountdownTimer
 from panoptes.utils import error
@@ -10,9 +12,10 @@ from huntsman.drp.collection import ExposureCollection, CalibCollection
 from huntsman.drp.services import CalibService
 
 
-@pytest.fixture(scope="function")
-def config(config):
+@pytest.fixture(scope="module")
+def lite_config(session_config):
     """ A config containing a smaller exposure sequence. """
+    config = deepcopy(session_config)
 
     config["exposure_sequence"]["n_days"] = 1
     config["exposure_sequence"]["n_cameras"] = 1
@@ -26,38 +29,47 @@ def config(config):
     return config
 
 
+@pytest.fixture(scope="function")
+def config(lite_config):
+    """ Function scope version of lite_config that should be used in tests. """
+    return deepcopy(lite_config)
+
+
+@pytest.fixture(scope="module")
+def fake_exposure_sequence_lite(tmp_path_factory, lite_config):
+    """ Generate the fake FITS images once and share them between tests in this module. """
+    tempdir = tmp_path_factory.mktemp("test_exposure_sequence_lite")
+    expseq = FakeExposureSequence(config=lite_config)
+    expseq.generate_fake_data(directory=tempdir)
+    return expseq
+
+
 @pytest.fixture(scope="function")
 def empty_calib_collection(config):
     """ An empty master calib collection. """
     col = CalibCollection.from_config(config)
     yield col
 
-    col.delete_all(really=True)
+    col.delete_all(really=True, drop=True)
 
 
 @pytest.fixture(scope="function")
-def exposure_collection_lite(tmp_path_factory, config):
+def exposure_collection_lite(fake_exposure_sequence_lite, config):
     """
-    Create a temporary directory populated with fake FITS images, then parse the images into the
-    raw data table.
+    Parse the shared fake FITS images into the raw data table.
     """
-    # Generate the fake data
-    tempdir = tmp_path_factory.mktemp("test_exposure_sequence")
-    expseq = FakeExposureSequence(config=config)
-    expseq.generate_fake_data(directory=tempdir)
+    expseq = fake_exposure_sequence_lite
 
     # Populate the database
     exposure_collection = ExposureCollection(config=config)
-    for filename, header in expseq.header_dict.items():
-        exposure_collection.ingest_file(filename)
+    exposure_collection.ingest_files(expseq.header_dict.keys(), nproc=4)
 
     # Make sure table has the correct number of rows
     assert exposure_collection.count_documents() == expseq.file_count
     yield exposure_collection
 
     # Remove the metadata from the DB ready for other tests
-    all_metadata = exposure_collection.find()
-    exposure_collection.delete_many(all_metadata)
+    exposure_collection.delete_all(really=True, drop=True)
 
 
 @pytest.fixture(scope="function")
@@ -67,6 +79,24 @@ def calib_service(config, exposure_collection_lite, empty_calib_collection):
     calib_service.stop()
 
 
+def test_list_archived_filenames(empty_calib_collection, tmp_path):
+    """ Check archived calib files are found for the correct date. """
+    calib_collection = empty_calib_collection
+    calib_collection.archive_dir = str(tmp_path)
+
+    date_ymd = "2021-01-01"
+    metadata = {"datasetType": "bias", "instrument": "Huntsman", "detector": 1, "date": date_ymd}
+    filename = calib_collection.get_calib_filename(metadata)
+    assert not calib_collection.list_archived_filenames(date_ymd)
+
+    os.makedirs(os.path.dirname(filename))
+    with open(filename, "w"):
+        pass
+
+    assert calib_collection.list_archived_filenames(date_ymd) == {filename}
+    assert not calib_collection.list_archived_filenames("2021-01-02")
+
+
 def test_master_calib_service(calib_service, config):
 
     n_calib_dates = config["exposure_sequence"]["n_days"]
@@ -77,6 +107,7 @@ def test_master_calib_service(calib_service, config):
     n_bias = n_calib_dates * n_cameras
     n_dark = n_calib_dates * n_cameras
     n_defect = n_dark
+    expected_counts = {"flat": n_flats, "bias": n_bias, "dark": n_dark, "defects": n_defect}
 
     calib_collection = calib_service.calib_collection
     assert not calib_collection.find()  # Check calib table is empty
@@ -89,25 +120,24 @@ def test_master_calib_service(calib_service, config):
     while not timer.expired():
         calib_service.logger.debug("Waiting for calibs...")
 
-        dataset_types = calib_collection.find(key="datasetType")
+        counts = calib_collection.count_by("datasetType")
 
         # Check if we are finished
-        if len([d for d in dataset_types if d == "flat"]) == n_flats:
-            if len([d for d in dataset_types if d == "bias"]) == n_bias:
-                if len([d for d in dataset_types if d == "dark"]) == n_dark:
-                    if len([d for d in dataset_types if d == "defects"]) == n_defect:
-                        break
-
-        for filename in calib_collection.find(key="filename"):
-            assert os.path.isfile(filename)
+        if all(counts.get(k, 0) == v for k, v in expected_counts.items()):
+            break
 
         if not calib_service.is_running:
             raise RuntimeError("Calib maker has stopped running. Check the logs for details.")
 
-        time.sleep(10)
+        time.sleep(1)  # Polling is cheap as the counts are made by the database
 
     if timer.expired():
         raise error.Timeout("Timeout while waiting for calibs.")
 
+    # Check the archived calib files exist
+    filenames = calib_collection.find(key="filename")
+    with ThreadPool(8) as pool:
+        assert all(pool.map(os.path.isfile, filenames))
+
     calib_service.stop()
     assert not calib_service.is_running
@@ -1,6 +1,8 @@
 import pytest
 import copy
+from collections import Counter
 from datetime import timedelta
+from multiprocessing.pool import ThreadPool
 import numpy as np
 
 from huntsman.drp.collection import ExposureCollection
@@ -22,9 +24,16 @@ def test_datatable_query_by_date(exposure_collection, config):
     """ Test ability to query using datetime ranges. """
 
     # Get list of all dates in the database
-    dates = [d["date"] for d in exposure_collection.find()]
+    documents = exposure_collection.find(projection=("date", "filename"))
+    dates = [d["date"] for d in documents]
     n_files = len(dates)
 
+    # Read the file dates once rather than for every query
+    all_filenames = [d["filename"] for d in documents]
+    with ThreadPool(8) as pool:
+        headers = pool.map(read_fits_header, all_filenames)
+    file_dates = {f: parse_fits_header(h)["date"] for f, h in zip(all_filenames, headers)}
+
     dates_unique = np.unique(dates)  # Sorted array of unique dates
     date_max = dates_unique[-1]
 
@@ -36,8 +45,7 @@ def test_datatable_query_by_date(exposure_collection, config):
         assert len(filenames) <= n_files  # This holds because we sorted the dates
 
         for filename in filenames:
-            header = read_fits_header(filename)
-            date = parse_fits_header(header)["date"]
+            date = file_dates[filename]
             assert date >= parse_date(date_min)
             assert date < parse_date(date_max)
 
@@ -99,10 +107,9 @@ def test_quality_filter(exposure_collection):
     documents = exposure_collection.find(document_filter)
     n_docs = len(documents)
 
-    for i, d in enumerate(documents):
-        exposure_collection.update_one(d, {"TEST_METRIC_1": i})
-    for i, d in enumerate(documents[::-1]):
-        exposure_collection.update_one(d, {"TEST_METRIC_2": i})
+    exposure_collection.bulk_update(
+        [(d, {"TEST_METRIC_1": i, "TEST_METRIC_2": n_docs - 1 - i})
+         for i, d in enumerate(documents)])
 
     exposure_collection.config["quality"]["raw"]["dark"] = {"TEST_METRIC_1": {"$lt": 1}}
     matches = exposure_collection.find(document_filter, quality_filter=True)
@@ -123,6 +130,65 @@ def test_quality_filter(exposure_collection):
     assert len(matches) == 0
 
 
+def test_count_documents(exposure_collection):
+    """ Check the server-side count agrees with the find result. """
+    document_filter = {"observation_type": "dark"}
+    n_docs = len(exposure_collection.find(document_filter))
+    assert n_docs > 1
+
+    assert exposure_collection.count_documents(document_filter) == n_docs
+    assert exposure_collection.count_documents(document_filter, limit=1) == 1
+
+    n_quality = len(exposure_collection.find(document_filter, quality_filter=True))
+    assert exposure_collection.count_documents(document_filter, quality_filter=True) == n_quality
+
+
+def test_bulk_update(exposure_collection):
+    """ Check many documents can be updated together and that missing documents are reported.
+    """
+    filenames = exposure_collection.find(key="filename")
+
+    updates = [({"filename": f}, {"metrics": {"test": i}}) for i, f in enumerate(filenames)]
+    exposure_collection.bulk_update(updates)
+
+    for i, filename in enumerate(filenames):
+        doc = exposure_collection.find_one({"filename": filename})
+        assert doc["metrics"]["test"] == i
+
+    with pytest.raises(RuntimeError):
+        exposure_collection.bulk_update([({"filename": "not_a_file.fits"}, {"test": 1})])
+
+
+def test_count_by(exposure_collection):
+    """ Check the server-side grouped counts agree with the find result. """
+    observation_types = exposure_collection.find(key="observation_type")
+    expected = Counter(observation_types)
+    assert len(expected) > 1
+
+    assert exposure_collection.count_by("observation_type") == expected
+
+    counts = exposure_collection.count_by("observation_type", {"observation_type": "dark"})
+    assert counts == {"dark": expected["dark"]}
+
+
+def test_get_calib_docs(exposure_collection):
+    """ Check the calib docs match those made directly from the raw calib documents. """
+    date = current_date()
+    data_types = exposure_collection.config["calibs"]["types"]
+
+    documents = exposure_collection.find({"observation_type": {"$in": data_types}},
+                                         quality_filter=True)
+    expected = set([exposure_collection.raw_doc_to_calib_doc(d, date=date) for d in documents])
+    assert expected
+
+    calib_docs = exposure_collection.get_calib_docs(date=date)
+    assert set([d for d in calib_docs if d["datasetType"] != "defects"]) == expected
+
+    # Defects are made from darks
+    n_darks = len([d for d in calib_docs if d["datasetType"] == "dark"])
+    assert len([d for d in calib_docs if d["datasetType"] == "defects"]) == n_darks
+
+
 def test_insert_duplicate(exposure_collection):
     """ Check an exception is raised when inserting a duplicate document. """
 
@@ -137,16 +203,21 @@ def test_ingest_duplicate_fpack(exposure_collection):
 
     doc = exposure_collection.find()[0]
 
-    doc1 = doc._document.copy()
-    doc1["filename"] = "test_insert_duplicate.fits"
-
-    doc2 = doc._document.copy()
-    doc2["filename"] = "test_insert_duplicate.fits.fz"
+    doc1 = dict(doc._document, filename="test_insert_duplicate.fits")
+    doc2 = dict(doc._document, filename="test_insert_duplicate.fits.fz")
 
     exposure_collection.insert_one(doc1)
     with pytest.raises(DuplicateKeyError):
         exposure_collection.insert_one(doc2)
 
+    # Filenames starting with characters in ".fz" should be handled correctly
+    doc3 = dict(doc._document, filename="fz_insert_duplicate.fits")
+    doc4 = dict(doc._document, filename="fz_insert_duplicate.fits.fz")
+
+    exposure_collection.insert_one(doc3)
+    with pytest.raises(DuplicateKeyError):
+        exposure_collection.insert_one(doc4)
+
     exposure_collection.delete_many(exposure_collection.find(), force=True)
 
     exposure_collection.insert_one(doc2)
@@ -173,3 +244,42 @@ def test_ingest_ref_image(exposure_collection_real_data, ref_calib_collection):
     new_doc = exposure_collection.find_one({"filename": doc["filename"]})
 
     assert "ref_chi2r_scaled" in new_doc["metrics"]
+
+
+def test_ingest_files(exposure_collection):
+    """ Test that files can be re-ingested together without creating duplicates. """
+    filenames = exposure_collection.find(key="filename")
+    n_docs = len(filenames)
+
+    exposure_collection.ingest_files(filenames[:2])
+    assert exposure_collection.count_documents() == n_docs
+
+    exposure_collection.delete_all(really=True)
+    exposure_collection.ingest_files(filenames, nproc=2)
+    assert set(exposure_collection.find(key="filename")) == set(filenames)
+
+
+def test_delete_all_drop(exposure_collection):
+    """ Check dropping the collection removes all documents but keeps the unique index. """
+    doc = exposure_collection.find()[0]
+
+    exposure_collection.delete_all(really=True, drop=True)
+    assert exposure_collection.count_documents() == 0
+
+    exposure_collection.insert_one(doc)
+    with pytest.raises(DuplicateKeyError):
+        exposure_collection.insert_one(doc)
+
+
+def test_delete_many_force(exposure_collection):
+    """ Check forced deletes work across batches and reject unused arguments. """
+    documents = exposure_collection.find()
+    n_docs = len(documents)
+    assert n_docs > 2
+
+    with pytest.raises(TypeError):
+        exposure_collection.delete_many(documents, force=True, not_an_arg=True)
+
+    exposure_collection._delete_batch_size = 2
+    exposure_collection.delete_many(documents[1:], force=True)
+    assert exposure_collection.find(key="filename") == [documents[0]["filename"]]
@@ -1,5 +1,4 @@
 import os
-import time
 import pytest
 
 from huntsman.drp.services.ingestor import FileIngestor
@@ -37,16 +36,8 @@ def test_file_ingestor(ingestor, tempdir_and_exposure_collection_with_uningested
     assert n_to_process > 0
 
     ingestor.start()
-    i = 0
-    timeout = 40
 
-    while (i < timeout):
-        if ingestor.is_running and ingestor.status["processed"] == n_to_process:
-            break
-        i += 1
-        time.sleep(1)
-
-    if i == timeout:
+    if not ingestor.wait_until_processed(n_to_process, timeout=40):
         raise RuntimeError(f"Timeout while waiting for processing of {n_to_process} images.")
 
     if not ingestor.is_running:
@@ -37,3 +37,14 @@ def test_cosmic_ray_density(filename_with_wcs, data):
     assert "cr_density" in result['cosmic_ray_density']
     assert result['cosmic_ray_density']['cr_count'] >= 0
     assert result['cosmic_ray_density']['cr_density'] >= 0
+
+
+def test_metric_evaluator_copy():
+    n_functions = len(raw.metric_evaluator.functions)
+
+    evaluator = raw.metric_evaluator.copy(ignore=["get_wcs"])
+    assert "get_wcs" not in [f.__name__ for f in evaluator.functions]
+    assert len(evaluator.functions) == n_functions - 1
+
+    # The shared evaluator should not be modified
+    assert len(raw.metric_evaluator.functions) == n_functions
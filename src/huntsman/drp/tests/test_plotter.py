@@ -33,7 +33,7 @@ def test_plotter_service(plotter_service):
     # Check that the files exist
     for p in plotter_service.plotters:
         assert os.path.isdir(p.image_dir)
-        n_images = sum([len(_) for _ in p._plot_configs.values()])
+        n_images = sum(len(_) for _ in p._plot_configs.values())
         n_actual = len([_ for _ in os.listdir(p.image_dir) if _.endswith(".png")])
 
         # Strictly, this should be an exact equality. However we don't necessarily know how many
@@ -1,5 +1,6 @@
 from datetime import datetime
 from huntsman.drp.utils.date import current_date, parse_date, current_date_ymd
+from huntsman.drp.utils.ingest import find_fpack_duplicates, scan_fits_directory
 
 
 def test_parse_date_datetime():
@@ -9,3 +10,18 @@ def test_parse_date_datetime():
 def test_date_to_ymd():
     date = current_date()
     assert current_date_ymd() == date.strftime('%Y-%m-%d')
+
+
+def test_find_fpack_duplicates():
+    filenames = ["a.fits", "a.fits.fz", "b.fits", "c.fits.fz", "dir/d.fits", "dir/d.fits.fz"]
+    assert find_fpack_duplicates(filenames) == {"a.fits", "dir/d.fits"}
+
+
+def test_scan_fits_directory(tmp_path):
+    for name in ("a.fits", "b.fits.fz", "c.txt"):
+        (tmp_path / name).touch()
+    (tmp_path / "subdir").mkdir()
+
+    filenames, subdirectories = scan_fits_directory(str(tmp_path))
+    assert filenames == {str(tmp_path / "a.fits"), str(tmp_path / "b.fits.fz")}
+    assert subdirectories == [str(tmp_path / "subdir")]
@@ -65,6 +65,10 @@ def parse_date(date):
     Returns:
         A `datetime.datetime` object.
     """
+    # Fast path for the most common case
+    if type(date) is datetime:
+        return date
+
     if isinstance(date, int):
         return datetime.fromtimestamp(date / 1e3)
 
@@ -74,9 +78,6 @@ def parse_date(date):
     with suppress(AttributeError):
         date = date.strip("(UTC)")
 
-    if type(date) is datetime:
-        return date
-
     return parse_date_dateutil(date)
 
 
@@ -11,12 +11,17 @@ def read_fits_data(filename, dtype="float32", **kwargs):
     """ Read fits image into numpy array.
     Args:
         filename (str): The name of ther file to read.
-        dtype (str, optional): The data type for the array. Default: float32.
+        dtype (str, optional): The data type for the array. If None, use the native data type
+            of the file. Default: float32.
         **kwargs: Parsed to fits.getdata.
     Returns:
         np.array: The image array.
     """
-    return fits.getdata(filename, **kwargs).astype(dtype)
+    data = fits.getdata(filename, **kwargs)
+    if dtype is None:
+        return data
+    # Avoid an extra copy of the image if it already has the requested type
+    return data.astype(dtype, copy=False)
 
 
 def read_fits_header(filename, **kwargs):
@@ -31,3 +31,38 @@ def list_fits_files_recursive(directory):
                 files_in_directory.append(os.path.join(dirpath, file))
 
     return files_in_directory
+
+
+def scan_fits_directory(directory):
+    """ List the FITS files and subdirectories directly contained within a directory.
+    Args:
+        directory (str): Directory to examine.
+    Returns:
+        set of str: The FITS filenames, including .fits.fz files.
+        list of str: The subdirectory names.
+    """
+    filenames = set()
+    subdirectories = []
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # Do not follow symlinks to directories, consistent with os.walk
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.endswith(('.fits', '.fits.fz')):
+                filenames.add(entry.path)
+
+    return filenames, subdirectories
+
+
+def find_fpack_duplicates(filenames):
+    """ Find uncompressed FITS files that also have an fpacked (.fits.fz) version.
+    Args:
+        filenames (iterable of str): The filenames to check.
+    Returns:
+        set of str: The .fits filenames that have a .fits.fz duplicate.
+    """
+    stems_fits = set([f[:-5] for f in filenames if f.endswith(".fits")])
+    stems_fz = set([f[:-8] for f in filenames if f.endswith(".fits.fz")])
+
+    return set([f"{stem}.fits" for stem in stems_fits & stems_fz])
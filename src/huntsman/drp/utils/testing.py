@@ -2,6 +2,7 @@ import os
 import yaml
 from glob import glob
 from datetime import timedelta
+from multiprocessing import Pool
 import numpy as np
 from astropy.io import fits
 from astropy import units as u
@@ -161,9 +162,9 @@ def create_test_calib_collection(config=None):
                 calibIds.append(dataId)
 
         # Archive the files
-        for filename, calibId in zip(filenames, calibIds):
+        for calibId in calibIds:
             calibId["raw_filenames"] = ["not_a_real_file"]
-            calib_collection.archive_master_calib(filename, calibId)
+        calib_collection.archive_master_calibs(zip(filenames, calibIds))
 
     assert calib_collection.find()
     return calib_collection
@@ -176,28 +177,72 @@ def make_hdu(data, date, cam_name, exposure_time, field, image_type, ccd_temp=0,
              imageId="TestImageId", ra=10, dec=-20, airmass=1, pixel_size=1):
     """Make a HDU with a minimal header for DRP to function."""
     hdu = fits.PrimaryHDU(data)
-    hdu.header['EXPTIME'] = exposure_time
-    hdu.header['FILTER'] = filter
-    hdu.header['FIELD'] = field
-    hdu.header['DATE-OBS'] = datetime_to_taiObs(date)
-    hdu.header["IMAGETYP"] = image_type
-    hdu.header["CAM-ID"] = cam_name
-    hdu.header["IMAGEID"] = imageId
-    hdu.header["CCD-TEMP"] = ccd_temp
-    hdu.header["RA-MNT"] = ra
-    hdu.header["DEC-MNT"] = dec
-    hdu.header["AIRMASS"] = airmass
-    hdu.header["CD1_1"] = pixel_size.to_value(u.degree / u.pixel)
-    hdu.header["CD2_2"] = pixel_size.to_value(u.degree / u.pixel)
-    hdu.header["CD1_2"] = 0
-    hdu.header["CD2_1"] = 0
-    hdu.header["BITDEPTH"] = 12
-    hdu.header["LAT-OBS"] = -31.16
-    hdu.header["LONG-OBS"] = 149.13
-    hdu.header["ELEV-OBS"] = 1160
+    pixel_scale = pixel_size.to_value(u.degree / u.pixel)
+
+    # Update the header in a single call rather than card by card
+    hdu.header.update({"EXPTIME": exposure_time,
+                       "FILTER": filter,
+                       "FIELD": field,
+                       "DATE-OBS": datetime_to_taiObs(date),
+                       "IMAGETYP": image_type,
+                       "CAM-ID": cam_name,
+                       "IMAGEID": imageId,
+                       "CCD-TEMP": ccd_temp,
+                       "RA-MNT": ra,
+                       "DEC-MNT": dec,
+                       "AIRMASS": airmass,
+                       "CD1_1": pixel_scale,
+                       "CD2_2": pixel_scale,
+                       "CD1_2": 0,
+                       "CD2_1": 0,
+                       "BITDEPTH": 12,
+                       "LAT-OBS": -31.16,
+                       "LONG-OBS": 149.13,
+                       "ELEV-OBS": 1160})
     return hdu
 
 
+def _write_hdu(hdu, filename):
+    """ Write a HDU to file and return its header.
+    Args:
+        hdu (fits.PrimaryHDU): The HDU to write.
+        filename (str): The filename.
+    Returns:
+        fits.Header: The header read back from the file.
+    """
+    # The header is generated by make_hdu so skip verification on write
+    hdu.writeto(filename, overwrite=True, output_verify="ignore")
+
+    # Read the header from file because astropy can modify the header during write
+    return fits.getheader(filename)
+
+
+def _write_fake_frame(filename, seed, adu, offset, shape, saturate, dtype, hdu_kwargs):
+    """ Make a fake frame with Poisson noise, write it to file and return its header.
+    This is a module-level function so that frames can be made in parallel processes.
+    Args:
+        filename (str): The filename.
+        seed (np.random.SeedSequence): The seed used to generate the data.
+        adu (float): The mean Poisson level.
+        offset (float): A constant added to the data, e.g. the bias level.
+        shape (tuple): The shape of the data.
+        saturate (float): The saturation level.
+        dtype (str): The data type.
+        hdu_kwargs (dict): Parsed to make_hdu.
+    Returns:
+        fits.Header: The header read back from the file.
+    """
+    rng = np.random.default_rng(seed)
+    data = rng.poisson(adu, size=shape)
+    data += offset
+    np.minimum(data, saturate, out=data)
+    data = data.astype(dtype, copy=False)
+    assert (data > 0).all()
+
+    hdu = make_hdu(data=data, **hdu_kwargs)
+    return _write_hdu(hdu, filename)
+
+
 class FakeExposureSequence(HuntsmanBase):
     """
     The `FakeExposureSequence` is responsible for generating fake FITS files based on settings
@@ -205,7 +250,13 @@ class FakeExposureSequence(HuntsmanBase):
     purposes.
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, seed=None, **kwargs):
+        """
+        Args:
+            seed (int, optional): The random seed. If None (default), get from the config if
+                provided there.
+            **kwargs: Parsed to HuntsmanBase.
+        """
         super().__init__(**kwargs)
         self.config = self.config["exposure_sequence"]
         self.file_count = 0
@@ -216,14 +267,21 @@ class FakeExposureSequence(HuntsmanBase):
         self.pixel_size = self.config["pixel_size"] * u.arcsecond / u.pixel
         self.header_dict = {}
 
-    def generate_fake_data(self, directory):
+        # Each frame gets its own seed so the data does not depend on the order frames are made
+        seed = self.config.get("seed") if seed is None else seed
+        self._seed_sequence = np.random.SeedSequence(seed)
+
+    def generate_fake_data(self, directory, nproc=4):
         """
         Create FITS files for the exposure sequence specified in the testing config and store
         their metadata.
 
         Args:
             directory (str): The name of the directory in which to store the FITS files.
+            nproc (int, optional): The number of processes used to make the files. Default: 4.
         """
+        frames = []
+
         exptime_sci = self.config["exptime_science"]
         exptime_flat = self.config["exptime_flat"]
         exptimes = [exptime_flat, exptime_sci]
@@ -241,35 +299,38 @@ class FakeExposureSequence(HuntsmanBase):
 
                     # Create the flats
                     for flat in range(self.config["n_flat"]):
-                        hdu = self._make_light_frame(date=dtime, cam_name=cam_name,
-                                                     field="FlatDither0", filter=filter,
-                                                     exposure_time=exptime_flat)
-                        self._write_data(hdu=hdu, directory=directory)
+                        frame = self._get_light_frame(date=dtime, cam_name=cam_name,
+                                                      field="FlatDither0", filter=filter,
+                                                      exposure_time=exptime_flat)
+                        frames.append(frame)
                         dtime += timedelta(seconds=exptime_flat)  # Increment time
 
                     # Create the science exposures
                     for sci in range(self.config["n_science"]):
-                        hdu = self._make_light_frame(date=dtime, cam_name=cam_name,
-                                                     exposure_time=exptime_sci, filter=filter,
-                                                     field="TestField0")
-                        self._write_data(hdu=hdu, directory=directory)
+                        frame = self._get_light_frame(date=dtime, cam_name=cam_name,
+                                                      exposure_time=exptime_sci, filter=filter,
+                                                      field="TestField0")
+                        frames.append(frame)
                         dtime += timedelta(seconds=exptime_flat)  # Increment time
 
                 # Create the dark frames using given exposure times
                 for _ in range(self.config["n_bias"]):
-                    hdu = self._make_dark_frame(date=dtime, cam_name=cam_name,
-                                                exposure_time=EXPTIME_BIAS, field="Bias")
-                    self._write_data(hdu=hdu, directory=directory)
+                    frame = self._get_dark_frame(date=dtime, cam_name=cam_name,
+                                                 exposure_time=EXPTIME_BIAS, field="Bias")
+                    frames.append(frame)
                     dtime += timedelta(seconds=1)  # Increment time
 
                 # Create the dark frames using given exposure times
                 for _ in range(self.config["n_dark"]):
                     for exptime in exptimes:
-                        hdu = self._make_dark_frame(date=dtime, cam_name=cam_name, field="Dark",
-                                                    exposure_time=exptime)
-                        self._write_data(hdu=hdu, directory=directory)
+                        frame = self._get_dark_frame(date=dtime, cam_name=cam_name, field="Dark",
+                                                     exposure_time=exptime)
+                        frames.append(frame)
                         dtime += timedelta(seconds=exptime)  # Increment time
 
+        # The sequence is specified in order, but the files can be made in parallel
+        self._write_data(frames, directory=directory, nproc=nproc)
+
     def _get_bias_level(self, exposure_time, ccd_temp=0):
         # TODO: Implement realistic scaling with exposure time
         return self.bias
@@ -278,49 +339,52 @@ class FakeExposureSequence(HuntsmanBase):
         # TODO: Implement realistic scaling with exposure time
         return 0.5 * self.saturate
 
-    def _make_light_frame(self, date, cam_name, exposure_time, filter, field):
-        """Make a light frame (either a science image or flat field)."""
+    def _get_light_frame(self, date, cam_name, exposure_time, filter, field):
+        """Get the kwargs to make a light frame (either a science image or flat field)."""
 
         adu = self._get_target_brightness(exposure_time=exposure_time, filter=filter)
-        data = np.random.poisson(adu, size=self.shape) + self._get_bias_level(exposure_time)
-        data[data > self.saturate] = self.saturate
-        data = data.astype(self.dtype)
-        assert (data > 0).all()
+        offset = self._get_bias_level(exposure_time)
+
+        hdu_kwargs = dict(date=date, cam_name=cam_name, exposure_time=exposure_time, field=field,
+                          filter=filter, image_type="Light Frame", pixel_size=self.pixel_size)
 
-        hdu = make_hdu(data=data, date=date, cam_name=cam_name, exposure_time=exposure_time,
-                       field=field, filter=filter, image_type="Light Frame",
-                       pixel_size=self.pixel_size)
-        return hdu
+        return {"adu": adu, "offset": offset, "hdu_kwargs": hdu_kwargs}
 
-    def _make_dark_frame(self, date, cam_name, exposure_time, field):
-        """Make a dark frame (bias or dark)."""
+    def _get_dark_frame(self, date, cam_name, exposure_time, field):
+        """Get the kwargs to make a dark frame (bias or dark)."""
 
         adu = self._get_bias_level(exposure_time=exposure_time) + 1 * exposure_time
-        data = np.random.poisson(adu, size=self.shape)
-        data[data > self.saturate] = self.saturate
-        data = data.astype(self.dtype)
-        assert (data > 0).all()
 
-        hdu = make_hdu(data=data, date=date, cam_name=cam_name, exposure_time=exposure_time,
-                       field=field, image_type="Dark Frame", pixel_size=self.pixel_size)
-        return hdu
+        hdu_kwargs = dict(date=date, cam_name=cam_name, exposure_time=exposure_time, field=field,
+                          image_type="Dark Frame", pixel_size=self.pixel_size)
 
-    def _get_filename(self, directory):
-        """ Get the filename for the next exposure in the sequence.
-        Args:
-            directory (str): The name of the directory in which to store the file.
-        Returns:
-            str: The filename.
-        """
-        return os.path.join(directory, f"testdata_{self.file_count}.fits")
+        return {"adu": adu, "offset": 0, "hdu_kwargs": hdu_kwargs}
 
-    def _write_data(self, hdu, directory):
-        """ Write the data to file, store the header and increment the file count.
+    def _write_data(self, frames, directory, nproc=1):
+        """ Make the files, store their headers and increment the file count.
         Args:
-            directory (str): The name of the directory in which to store the file.
+            frames (list of dict): The frame kwargs in sequence order.
+            directory (str): The name of the directory in which to store the files.
+            nproc (int, optional): The number of processes used to make the files. Default: 1.
         """
-        filename = self._get_filename(directory)
-        hdu.writeto(filename, overwrite=True)
-        # Read the header from file because astropy can modify the header during write
-        self.header_dict[filename] = fits.getheader(filename)
-        self.file_count += 1
+        # Assign the filenames in sequence order
+        # Directory may be a path object, so convert it to a string once rather than per file
+        directory = os.fspath(directory)
+        count = self.file_count
+        filenames = [f"{directory}/testdata_{count + i}.fits" for i in range(len(frames))]
+        self.file_count += len(frames)
+
+        seeds = self._seed_sequence.spawn(len(frames))
+
+        args = [(filename, seed, f["adu"], f["offset"], self.shape, self.saturate, self.dtype,
+                 f["hdu_kwargs"]) for filename, seed, f in zip(filenames, seeds, frames)]
+
+        # Generating the data is CPU bound so use processes rather than threads
+        # Small sequences are quicker to make without the overhead of starting a pool
+        if nproc > 1 and len(args) > nproc:
+            with Pool(nproc) as pool:
+                headers = pool.starmap(_write_fake_frame, args)
+        else:
+            headers = [_write_fake_frame(*a) for a in args]
+
+        self.header_dict.update(zip(filenames, headers))